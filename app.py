@@ -1,44 +1,95 @@
 """Main FastAPI application for X Growth AI Tool"""
-from fastapi import FastAPI, HTTPException, Request, Cookie, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Request, Cookie, BackgroundTasks, Depends
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-import requests
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from pydantic import BaseModel, ConfigDict
+from typing import Annotated, List, Dict, Any, Optional
+from datetime import datetime, date
+from pathlib import Path
 from collections import defaultdict
-from time import time
+from time import time, monotonic
+import asyncio
+import hashlib
+import httpx
+import orjson
+import re
+import secrets
+import traceback
+import anyio
+import config
 
 # Import features
 from features.content_intelligence import analyze_list_content, analyze_multiple_lists
 from features.content_machine import (
-    generate_monthly_posts, add_posts_to_schedule, get_scheduled_posts,
-    update_post, delete_post, approve_post, get_post_rationale
+    generate_monthly_posts, add_posts_to_schedule,
+    update_post, delete_post, approve_post, get_post_rationale, get_post_by_id,
+    iter_scheduled_posts_json
 )
 from features.daily_actions import (
     get_daily_targets, get_prioritized_actions, track_action,
     get_today_progress, sync_from_x_api
 )
 from features.reply_guy import process_reply_opportunities, get_pending_replies, mark_reply_used
-from core.persona_state import load_persona_state, get_persona_explanation
+from core.persona_state import load_persona_state, get_persona_explanation, flush_persona_states
 from core.auth import (
-    register_user, login_user, get_user_from_session,
-    update_user, get_user_data_dir
+    register_user, login_user, get_user_from_session, get_cached_user_from_session,
+    logout_session, purge_expired_sessions, flush_pending_users, update_user, get_user_data_dir
 )
+from services import x_api, ai_service
 from services.x_api import get_user_lists, get_current_user
+from services.ai_service import expand_keywords_semantically, generate_search_queries, validate_openai_key
 from onboarding import run_onboarding_phase1
+from onboarding_flow import (
+    get_onboarding_step, connect_x_account, save_keywords, save_keyword_relevance,
+    _prepare_onboarding_data, get_interactive_onboarding_status, get_next_onboarding_post,
+    get_next_onboarding_profile, save_onboarding_response, complete_interactive_onboarding,
+    skip_onboarding_phase
+)
+
+app = FastAPI(title="X Growth AI Tool", version="1.0.0", default_response_class=ORJSONResponse)
+# JSON payloads (schedule, persona, analyses) compress well; skip tiny responses
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
+# HTML shells are static, so read them once at import instead of per request
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+AUTH_HTML = (TEMPLATES_DIR / "auth.html").read_bytes()
+INDEX_HTML = (TEMPLATES_DIR / "index.html").read_bytes()
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers reuse files for a short max-age before revalidating"""
+    
+    def __init__(self, *args, max_age: int = 60, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+    
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
 
-app = FastAPI(title="X Growth AI Tool", version="1.0.0")
+
+# Same shells as plain static files, so a reverse proxy/CDN can cache them
+app.mount("/static", CachedStaticFiles(directory=TEMPLATES_DIR, html=True), name="static")
 
 
 # Pydantic models
 class TrackActionRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     action_type: str
     action_data: Dict[str, Any]
     action_date: Optional[str] = None
 
 
 class UpdatePostRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     content: Optional[str] = None
     scheduled_date: Optional[str] = None
     scheduled_time: Optional[str] = None
@@ -46,6 +97,8 @@ class UpdatePostRequest(BaseModel):
 
 
 class ReplyCheckRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
     list_ids: List[str]
 
 
@@ -63,73 +116,205 @@ async def get_current_user_from_request(request: Request) -> Optional[Dict[str,
         session_token = request.headers.get('X-Session-Token')
     
     if session_token:
-        return get_user_from_session(session_token)
+        # Cache hits are a dict lookup; only misses hop to a worker thread for disk/SQLite reads
+        user = get_cached_user_from_session(session_token)
+        if user is not None:
+            return user
+        return await run_in_threadpool(get_user_from_session, session_token)
     return None
 
 
+async def require_user(request: Request) -> Dict[str, Any]:
+    """Dependency that resolves the current user or rejects with 401"""
+    user = await get_current_user_from_request(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user
+
+
+# Endpoint parameter types; FastAPI resolves each dependency once per request
+CurrentUser = Annotated[Dict[str, Any], Depends(require_user)]
+
+
+async def require_user_id(user: CurrentUser) -> str:
+    """Dependency that yields just the authenticated user's id"""
+    return user["user_id"]
+
+
+CurrentUserId = Annotated[str, Depends(require_user_id)]
+
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Error responses (401s on every anonymous call) through orjson like everything else"""
+    headers = getattr(exc, "headers", None)
+    if exc.status_code in (204, 304) or exc.status_code < 200:
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """422 bodies through orjson"""
+    return ORJSONResponse({"detail": jsonable_encoder(exc.errors())}, status_code=422)
+
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Turn uncaught errors into a JSON 500 (HTTPExceptions keep their own status)"""
+    return ORJSONResponse({"detail": str(exc)}, status_code=500)
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+AUTH_HTML_ETAG = compute_etag(AUTH_HTML)
+INDEX_HTML_ETAG = compute_etag(INDEX_HTML)
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str,
+    cache_control: str = "private, no-cache"
+) -> Response:
+    """Send body with its ETag, or an empty 304 when the client already has it"""
+    headers = {
+        "ETag": etag,
+        # By default the browser must revalidate, but an unchanged body costs only a 304
+        "Cache-Control": cache_control
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names etag"""
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def etag_json_response(request: Request, payload: Any, cache_control: str = "private, no-cache") -> Response:
+    """Serialize payload once and answer conditional GETs with 304 when unchanged"""
+    body = orjson.dumps(payload)
+    return conditional_response(request, body, compute_etag(body), "application/json", cache_control)
+
+
+# In-flight work keyed by (operation, args..., user_id); identical concurrent calls share one result
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+async def single_flight(key: tuple, func, *args, **kwargs) -> Any:
+    """Run blocking func in the threadpool once per key, even if called concurrently"""
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(run_in_threadpool(func, *args, **kwargs))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one caller disconnecting doesn't cancel the work for the others
+    return await asyncio.shield(future)
+
+
+def _json_array_chunks(documents, batch_size: int = 200):
+    """A JSON array of already-encoded JSON documents, a batch of documents per chunk"""
+    yield b"["
+    batch = []
+    first = True
+    for document in documents:
+        batch.append(document.encode())
+        if len(batch) >= batch_size:
+            yield (b"" if first else b",") + b",".join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield (b"" if first else b",") + b",".join(batch)
+    yield b"]"
+
+
+def etag_streamed_json_array(
+    request: Request,
+    open_documents,
+    cache_control: str = "private, no-cache"
+) -> Response:
+    """
+    Stream a JSON array of stored JSON documents, with ETag revalidation
+    
+    open_documents() returns a fresh row iterator. A first pass hashes the body
+    for the ETag (so unchanged data still costs only a 304), a second one is
+    streamed; neither holds more than a batch of rows. If the rows change in
+    between, the next revalidation simply misses and sends them again.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for chunk in _json_array_chunks(open_documents()):
+        digest.update(chunk)
+    etag = '"' + digest.hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(_json_array_chunks(open_documents()), media_type="application/json", headers=headers)
+
+
 # Auth routes
 @app.get("/auth", response_class=HTMLResponse)
-async def auth_page():
+async def auth_page(request: Request):
     """Serve authentication page"""
-    from pathlib import Path
-    html_file = Path(__file__).parent / "templates" / "auth.html"
-    with open(html_file, 'r', encoding='utf-8') as f:
-        return HTMLResponse(content=f.read())
+    return conditional_response(request, AUTH_HTML, AUTH_HTML_ETAG, "text/html")
 
 
 @app.post("/api/auth/register")
 async def register_endpoint(request: Request):
     """Register a new user"""
-    try:
-        data = await request.json()
-        result = register_user(
-            email=data.get("email"),
-            password=data.get("password"),
-            username=data.get("username")
-        )
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    data = orjson.loads(await request.body())
+    result = await run_in_threadpool(
+        register_user,
+        email=data.get("email"),
+        password=data.get("password"),
+        username=data.get("username")
+    )
+    return result
 
 
 @app.post("/api/auth/login")
 async def login_endpoint(request: Request):
     """Login user"""
-    try:
-        data = await request.json()
-        result = login_user(
-            email=data.get("email"),
-            password=data.get("password")
+    data = orjson.loads(await request.body())
+    result = await run_in_threadpool(
+        login_user,
+        email=data.get("email"),
+        password=data.get("password")
+    )
+    success = bool(result.get("success"))
+    response = ORJSONResponse(result, status_code=200 if success else 401)
+    if success:
+        response.set_cookie(
+            key="session_token",
+            value=result["session_token"],
+            max_age=30*24*60*60,  # 30 days
+            httponly=True,
+            secure=True,
+            samesite="lax"
         )
-        if result.get("success"):
-            response = JSONResponse(result)
-            response.set_cookie(
-                key="session_token",
-                value=result["session_token"],
-                max_age=30*24*60*60,  # 30 days
-                httponly=True,
-                samesite="lax"
-            )
-            return response
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return response
 
 
 @app.post("/api/auth/logout")
 async def logout_endpoint(request: Request):
     """Logout user"""
-    response = JSONResponse({"success": True})
+    session_token = request.cookies.get('session_token') or request.headers.get('X-Session-Token')
+    if session_token:
+        await run_in_threadpool(logout_session, session_token)
+    response = ORJSONResponse({"success": True})
     response.delete_cookie("session_token")
     return response
 
 
 @app.get("/api/auth/me")
-async def get_current_user_endpoint(request: Request):
+async def get_current_user_endpoint(user: CurrentUser):
     """Get current authenticated user"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
     return {
         "user_id": user.get("user_id"),
         "username": user.get("username"),
@@ -150,341 +335,290 @@ async def root(request: Request):
     if not user:
         return RedirectResponse(url="/auth")
     
-    from pathlib import Path
-    html_file = Path(__file__).parent / "templates" / "index.html"
-    with open(html_file, 'r', encoding='utf-8') as f:
-        return HTMLResponse(content=f.read())
+    return conditional_response(request, INDEX_HTML, INDEX_HTML_ETAG, "text/html")
 
 
 # Persona State API
 @app.get("/api/persona/state")
-async def get_persona_state_endpoint(request: Request):
+def get_persona_state_endpoint(request: Request, user_id: CurrentUserId):
     """Get current Persona State"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    return load_persona_state(user.get("user_id"))
+    return etag_json_response(request, load_persona_state(user_id))
 
 
 @app.get("/api/persona/explanation")
-async def get_persona_explanation_endpoint(request: Request):
+def get_persona_explanation_endpoint(user_id: CurrentUserId):
     """Get human-readable Persona State explanation"""
-    from fastapi.responses import PlainTextResponse
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    explanation = get_persona_explanation(user.get("user_id"))
+    explanation = get_persona_explanation(user_id)
     return PlainTextResponse(content=explanation)
 
 
 # Content Intelligence API
 @app.get("/api/content-intelligence/analyze/{list_id}")
-async def analyze_list_endpoint(request: Request, list_id: str, days_back: int = 30):
+async def analyze_list_endpoint(list_id: str, user_id: CurrentUserId, days_back: int = 30):
     """Analyze content from an X List"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        result = analyze_list_content(list_id, days_back, user_id=user.get("user_id"))
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await single_flight(
+        ("analyze", list_id, days_back, user_id),
+        analyze_list_content, list_id, days_back, user_id=user_id
+    )
+    return result
 
 
 @app.post("/api/content-intelligence/analyze-multiple")
-async def analyze_multiple_lists_endpoint(list_ids: List[str], days_back: int = 30):
+async def analyze_multiple_lists_endpoint(list_ids: List[str], user_id: CurrentUserId, days_back: int = 30):
     """Analyze content from multiple lists"""
-    try:
-        result = analyze_multiple_lists(list_ids, days_back)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await run_in_threadpool(analyze_multiple_lists, list_ids, days_back, user_id)
+    return result
 
 
 # Content Machine API
-@app.post("/api/content-machine/generate")
-async def generate_posts_endpoint(request: Request, count: int = 30, external_signals: Optional[str] = None):
-    """Generate monthly posts"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+def _generate_and_schedule_posts(count: int, external_signals: Optional[str], user_id: Optional[str]) -> Dict[str, Any]:
+    """Generate posts and add the valid ones to the user's schedule"""
+    posts = generate_monthly_posts(count, external_signals, user_id=user_id)
+    # Filter out any error posts
+    valid_posts = [p for p in posts if "error" not in p]
+    if valid_posts:
+        add_posts_to_schedule(valid_posts, user_id)
+    return {"count": len(valid_posts), "posts": valid_posts}
+
+
+# Background jobs by id; finished jobs are kept for an hour so clients can collect the result
+_jobs: Dict[str, Dict[str, Any]] = {}
+_job_ids_by_key: Dict[tuple, str] = {}
+_job_ttl = 3600  # seconds
+
+
+def _prune_jobs() -> None:
+    """Forget finished jobs older than the TTL"""
+    cutoff = time() - _job_ttl
+    for job_id in [jid for jid, job in _jobs.items() if job.get("finished_at") and job["finished_at"] < cutoff]:
+        del _jobs[job_id]
+
+
+async def _run_generate_job(job_id: str, key: tuple, count: int, external_signals: Optional[str], user_id: str) -> None:
+    """Run post generation in the threadpool and record the outcome on the job"""
+    job = _jobs[job_id]
     try:
-        posts = generate_monthly_posts(count, external_signals, user.get("user_id"))
-        # Filter out any error posts
-        valid_posts = [p for p in posts if "error" not in p]
-        if valid_posts:
-            add_posts_to_schedule(valid_posts, user.get("user_id"))
-        return {"count": len(valid_posts), "posts": valid_posts}
+        job["result"] = await run_in_threadpool(_generate_and_schedule_posts, count, external_signals, user_id)
+        job["status"] = "done"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Error generating posts: {e}")
+        job["status"] = "error"
+        job["error"] = str(e)
+    finally:
+        job["finished_at"] = time()
+        _job_ids_by_key.pop(key, None)
+
+
+@app.post("/api/content-machine/generate", status_code=202)
+async def generate_posts_endpoint(background_tasks: BackgroundTasks, user_id: CurrentUserId, count: int = 30, external_signals: Optional[str] = None):
+    """Start generating monthly posts; poll /api/jobs/{job_id} for the result"""
+    # A double-click or second tab gets the running job instead of scheduling twice
+    key = ("generate", count, external_signals, user_id)
+    job_id = _job_ids_by_key.get(key)
+    if job_id is None:
+        _prune_jobs()
+        job_id = secrets.token_urlsafe(16)
+        _jobs[job_id] = {"job_id": job_id, "type": "generate", "status": "running", "user_id": user_id, "created_at": time()}
+        _job_ids_by_key[key] = job_id
+        background_tasks.add_task(_run_generate_job, job_id, key, count, external_signals, user_id)
+    return {"job_id": job_id, "status": _jobs[job_id]["status"]}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_endpoint(job_id: str, user_id: CurrentUserId):
+    """Status of a background job (result/error once finished)"""
+    job = _jobs.get(job_id)
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {k: v for k, v in job.items() if k != "user_id"}
 
 
 @app.get("/api/content-machine/schedule")
-async def get_schedule_endpoint(request: Request, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    """Get scheduled posts"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        posts = get_scheduled_posts(start_date, end_date, user.get("user_id"))
-        return posts
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def get_schedule_endpoint(request: Request, user_id: CurrentUserId, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """Get scheduled posts, streamed from the posts table"""
+    return etag_streamed_json_array(request, lambda: iter_scheduled_posts_json(start_date, end_date, user_id))
+
+
+@app.get("/api/content-machine/schedule.ndjson")
+def get_schedule_ndjson_endpoint(user_id: CurrentUserId, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """Stream scheduled posts as NDJSON, one post per line, without building the whole list"""
+    posts = iter_scheduled_posts_json(start_date, end_date, user_id)
+    return StreamingResponse((post.encode() + b"\n" for post in posts), media_type="application/x-ndjson")
 
 
 @app.get("/api/content-machine/posts/{post_id}")
-async def get_post_endpoint(post_id: str):
+def get_post_endpoint(post_id: str, user_id: CurrentUserId):
     """Get a specific post"""
-    schedule = get_scheduled_posts()
-    for post in schedule:
-        if post.get("id") == post_id:
-            return post
-    raise HTTPException(status_code=404, detail="Post not found")
+    post = get_post_by_id(post_id, user_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return post
 
 
 @app.put("/api/content-machine/posts/{post_id}")
-async def update_post_endpoint(request: Request, post_id: str, updates: UpdatePostRequest):
+def update_post_endpoint(post_id: str, updates: UpdatePostRequest, user_id: CurrentUserId):
     """Update a scheduled post"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        update_dict = updates.dict(exclude_unset=True)
-        result = update_post(post_id, update_dict, user.get("user_id"))
-        if "error" in result:
-            raise HTTPException(status_code=404, detail=result["error"])
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    update_dict = updates.model_dump(exclude_unset=True)
+    result = update_post(post_id, update_dict, user_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
 
 
 @app.delete("/api/content-machine/posts/{post_id}")
-async def delete_post_endpoint(request: Request, post_id: str):
+def delete_post_endpoint(post_id: str, user_id: CurrentUserId):
     """Delete a scheduled post"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        result = delete_post(post_id, user.get("user_id"))
-        if "error" in result:
-            raise HTTPException(status_code=404, detail=result["error"])
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = delete_post(post_id, user_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
 
 
 @app.post("/api/content-machine/posts/{post_id}/approve")
-async def approve_post_endpoint(request: Request, post_id: str):
+def approve_post_endpoint(post_id: str, user_id: CurrentUserId):
     """Approve a post"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        result = approve_post(post_id, user.get("user_id"))
-        if "error" in result:
-            raise HTTPException(status_code=404, detail=result["error"])
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = approve_post(post_id, user_id)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
 
 
 @app.get("/api/content-machine/posts/{post_id}/rationale")
-async def get_post_rationale_endpoint(request: Request, post_id: str):
+def get_post_rationale_endpoint(post_id: str, user_id: CurrentUserId):
     """Get rationale for why a post fits persona"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        rationale = get_post_rationale(post_id, user.get("user_id"))
-        return {"rationale": rationale}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    rationale = get_post_rationale(post_id, user_id)
+    return {"rationale": rationale}
 
 
 # Daily Actions API
 @app.get("/api/daily-actions/targets")
-async def get_targets_endpoint(request: Request, target_date: Optional[str] = None):
+def get_targets_endpoint(request: Request, user_id: CurrentUserId, target_date: Optional[date] = None):
     """Get daily action targets"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        return get_daily_targets(target_date, user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # Targets follow the current persona state and activity log, so always revalidate
+    targets = get_daily_targets(target_date, user_id)
+    return etag_json_response(request, targets)
 
 
 @app.get("/api/daily-actions/prioritized")
-async def get_prioritized_endpoint(request: Request, target_date: Optional[str] = None):
+def get_prioritized_endpoint(user_id: CurrentUserId, target_date: Optional[date] = None):
     """Get prioritized actions"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        return get_prioritized_actions(target_date, user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return get_prioritized_actions(target_date, user_id)
 
 
 @app.get("/api/daily-actions/progress")
-async def get_progress_endpoint(request: Request, target_date: Optional[str] = None):
+def get_progress_endpoint(user_id: CurrentUserId, target_date: Optional[date] = None):
     """Get today's progress"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        return get_today_progress(target_date, user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return get_today_progress(target_date, user_id)
 
 
 @app.post("/api/daily-actions/track")
-async def track_action_endpoint(request: Request, action_request: TrackActionRequest):
+def track_action_endpoint(action_request: TrackActionRequest, user_id: CurrentUserId):
     """Track a completed action"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    try:
-        return track_action(
-            action_request.action_type, 
-            action_request.action_data, 
-            action_request.action_date,
-            user.get("user_id")
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return track_action(
+        action_request.action_type, 
+        action_request.action_data, 
+        action_request.action_date,
+        user_id
+    )
 
 
 @app.post("/api/daily-actions/sync")
 async def sync_actions_endpoint(username: Optional[str] = None):
     """Sync actions from X API"""
-    try:
-        return sync_from_x_api(username)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_in_threadpool(sync_from_x_api, username)
 
 
 # Reply Guy API
 @app.post("/api/reply-guy/check")
 async def check_replies_endpoint(request: ReplyCheckRequest):
     """Check for reply opportunities"""
-    try:
-        result = process_reply_opportunities(request.list_ids)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await run_in_threadpool(process_reply_opportunities, request.list_ids)
+    return result
 
 
 @app.get("/api/reply-guy/pending")
-async def get_pending_replies_endpoint():
+def get_pending_replies_endpoint():
     """Get pending reply opportunities"""
-    try:
-        return get_pending_replies()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return get_pending_replies()
 
 
 @app.post("/api/reply-guy/mark-used/{post_id}")
-async def mark_reply_used_endpoint(post_id: str, reply_content: Optional[str] = None):
+def mark_reply_used_endpoint(post_id: str, reply_content: Optional[str] = None):
     """Mark a reply as used"""
-    try:
-        if not reply_content:
-            raise HTTPException(status_code=400, detail="reply_content parameter required")
-        return mark_reply_used(post_id, reply_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not reply_content:
+        raise HTTPException(status_code=400, detail="reply_content parameter required")
+    return mark_reply_used(post_id, reply_content)
 
 
 @app.post("/api/reply-guy/post/{post_id}")
-async def post_reply_endpoint(request: Request, post_id: str):
+async def post_reply_endpoint(request: Request, post_id: str, user_id: CurrentUserId):
     """Post a reply to X (with explicit approval)"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+    data = orjson.loads(await request.body())
+    reply_content = data.get("reply_content")
+    original_post_id = data.get("original_post_id")
     
-    try:
-        data = await request.json()
-        reply_content = data.get("reply_content")
-        original_post_id = data.get("original_post_id")
-        
-        if not reply_content:
-            raise HTTPException(status_code=400, detail="reply_content required")
-        
-        from services.x_api import create_tweet
-        
-        # Post reply to X
-        result = create_tweet(reply_content, reply_to_tweet_id=original_post_id)
+    if not reply_content:
+        raise HTTPException(status_code=400, detail="reply_content required")
+    
+    # Kept local: services.x_api does not define create_tweet yet, and a module-level
+    # import would stop the whole app from starting instead of failing this endpoint
+    from services.x_api import create_tweet
+    
+    # Post reply to X
+    result = await run_in_threadpool(create_tweet, reply_content, reply_to_tweet_id=original_post_id)
+    
+    if result.get("success"):
+        # Mark reply as used and posted
+        mark_reply_used(post_id, reply_content)
         
-        if result.get("success"):
-            # Mark reply as used and posted
-            mark_reply_used(post_id, reply_content)
-            
-            return {
-                "success": True,
-                "message": "Reply posted to X",
-                "tweet_id": result.get("tweet_id")
-            }
-        else:
-            raise HTTPException(status_code=500, detail=result.get("error", "Failed to post reply"))
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return {
+            "success": True,
+            "message": "Reply posted to X",
+            "tweet_id": result.get("tweet_id")
+        }
+    else:
+        raise HTTPException(status_code=500, detail=result.get("error", "Failed to post reply"))
 
 
 # X API Integration
 @app.get("/api/x/lists")
 async def get_x_lists_endpoint(username: Optional[str] = None):
     """Get user's X Lists"""
-    try:
-        lists = get_user_lists(username)
-        return {"lists": lists}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    lists = await run_in_threadpool(get_user_lists, username)
+    return {"lists": lists}
 
 
 @app.get("/api/x/user")
 async def get_x_user_endpoint():
     """Get current authenticated user"""
-    try:
-        user = get_current_user()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not authenticated")
-        return user
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    user = await run_in_threadpool(get_current_user)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not authenticated")
+    return user
 
 
 # Onboarding API
 @app.get("/api/onboarding/status")
-async def onboarding_status_endpoint(request: Request):
+async def onboarding_status_endpoint(user: CurrentUser):
     """Check onboarding status for current user"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    from onboarding_flow import get_onboarding_step
-    return get_onboarding_step(user.get("user_id"))
+    # The session-cached user record is current (save_user clears the cache)
+    return get_onboarding_step(user.get("user_id"), user)
 
 
 @app.get("/api/onboarding/step")
-async def get_onboarding_step_endpoint(request: Request):
+async def get_onboarding_step_endpoint(user: CurrentUser):
     """Get current onboarding step"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    from onboarding_flow import get_onboarding_step
-    return get_onboarding_step(user.get("user_id"))
+    # The session-cached user record is current (save_user clears the cache)
+    return get_onboarding_step(user.get("user_id"), user)
 
 
-# Simple cache for user searches (30 second TTL)
+# Cache of normalized user-search payloads keyed by lowercased handle (5 minute TTL)
 _user_search_cache = {}
-_cache_ttl = 30  # seconds
+_cache_ttl = 300  # seconds
+_cache_max_size = 5000
 
-def _get_cached_user_search(query: str):
+def _get_cached_user_search(cache_key: str):
     """Get cached user search result if available and not expired"""
-    cache_key = query.lower().strip()
     if cache_key in _user_search_cache:
         result, timestamp = _user_search_cache[cache_key]
         if time() - timestamp < _cache_ttl:
@@ -493,119 +627,130 @@ def _get_cached_user_search(query: str):
             del _user_search_cache[cache_key]
     return None
 
-def _cache_user_search(query: str, result: dict):
+
+def _cache_user_search(cache_key: str, result: dict):
     """Cache user search result"""
-    cache_key = query.lower().strip()
     _user_search_cache[cache_key] = (result, time())
-    # Clean old entries (keep cache size reasonable)
-    if len(_user_search_cache) > 100:
+    # Keep cache size bounded: drop expired entries, then the oldest
+    if len(_user_search_cache) > _cache_max_size:
         current_time = time()
         expired_keys = [k for k, (_, ts) in _user_search_cache.items() if current_time - ts >= _cache_ttl]
         for k in expired_keys:
             del _user_search_cache[k]
+        while len(_user_search_cache) > _cache_max_size:
+            del _user_search_cache[next(iter(_user_search_cache))]
+
+
+# Per-user token bucket for upstream lookups: bursts of 8, refilled at 4 per second
+_search_buckets = {}
+_search_rate = 4.0  # tokens per second
+_search_burst = 8.0
+
+
+def _allow_user_search(user_id: str) -> bool:
+    """Take a token from the user's bucket; False when they're typing faster than the budget"""
+    now = monotonic()
+    tokens, last = _search_buckets.get(user_id, (_search_burst, now))
+    tokens = min(_search_burst, tokens + (now - last) * _search_rate)
+    if tokens < 1.0:
+        _search_buckets[user_id] = (tokens, now)
+        return False
+    if user_id not in _search_buckets and len(_search_buckets) >= _cache_max_size:
+        # Full buckets are indistinguishable from missing ones, so dropping the oldest is safe enough
+        _search_buckets.pop(next(iter(_search_buckets)), None)
+    _search_buckets[user_id] = (tokens - 1.0, now)
+    return True
+
+
+# Attribute names differ between tweepy objects and the HTTP client's responses
+_PROFILE_IMAGE_KEYS = ('profile_image_url', 'profilePicture')
+_VERIFIED_KEYS = ('verified', 'isBlueVerified')
+
+
+def _normalize_user(user_obj: Any, clean_query: str) -> Optional[Dict[str, Any]]:
+    """Autocomplete entry for a tweepy or HTTP-client user lookup (None if no user)"""
+    # tweepy and the HTTP client wrap the user in .data; the HTTP client may also return it directly
+    user_data = getattr(user_obj, 'data', user_obj)
+    if not user_data or getattr(user_data, 'id', None) is None:
+        return None
+    
+    username = getattr(user_data, 'username', None) or clean_query
+    profile_image = ''
+    for key in _PROFILE_IMAGE_KEYS:
+        profile_image = getattr(user_data, key, None)
+        if profile_image:
+            break
+    
+    return {
+        "id": str(user_data.id),
+        "username": username,
+        "name": getattr(user_data, 'name', None) or username,
+        "profile_image_url": profile_image or '',
+        "verified": any(getattr(user_data, key, False) for key in _VERIFIED_KEYS)
+    }
+
+
+def _search_user(clean_query: str) -> Dict[str, Any]:
+    """Look up a handle on X and return the autocomplete payload (cached)"""
+    cache_key = clean_query.lower()
+    try:
+        user_obj = x_api.client.get_user(username=clean_query)
+    except Exception as e:
+        # Not cached, so a transient failure doesn't stick for the whole TTL
+        print(f"Error searching users: {e}")
+        if config.DEBUG:
+            traceback.print_exc()
+        return {"users": []}
+    
+    user_entry = _normalize_user(user_obj, clean_query) if user_obj else None
+    result = {"users": [user_entry] if user_entry else []}
+    _cache_user_search(cache_key, result)
+    return result
+
 
 @app.get("/api/onboarding/search-users")
-async def search_users_endpoint(request: Request, query: str):
+async def search_users_endpoint(query: str, user_id: CurrentUserId):
     """Search for users by username for autocomplete"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+    clean_query = query.replace('@', '').strip()
     
-    if not query or len(query) < 1:  # Reduced from 2 to 1 for faster feedback
+    # If query is empty, return early to avoid unnecessary API calls
+    if len(clean_query) < 1:
         return {"users": []}
     
     # Check cache first (instant return if cached)
-    cached_result = _get_cached_user_search(query)
+    cache_key = clean_query.lower()
+    cached_result = _get_cached_user_search(cache_key)
     if cached_result is not None:
         return cached_result
     
-    from services.x_api import client
-    if not client:
+    # x_api.client is swapped at runtime when falling back to the HTTP client
+    if not x_api.client:
         return {"users": []}
     
-    try:
-        clean_query = query.replace('@', '').strip()
-        
-        # If query is very short, return empty to avoid unnecessary API calls
-        if len(clean_query) < 1:
-            return {"users": []}
-        
-        # Try direct user lookup first
-        user_obj = client.get_user(username=clean_query)
-        
-        if user_obj:
-            # Handle both tweepy and HTTP client responses
-            if hasattr(user_obj, 'data') and user_obj.data:
-                user_data = user_obj.data
-                profile_image = getattr(user_data, 'profile_image_url', '') or ''
-                return {
-                    "users": [{
-                        "id": str(user_data.id),
-                        "username": user_data.username,
-                        "name": getattr(user_data, 'name', user_data.username),
-                        "profile_image_url": profile_image,
-                        "verified": getattr(user_data, 'verified', False)
-                    }]
-                }
-            elif hasattr(user_obj, 'data'):
-                # HTTP client wraps in 'data' attribute
-                user_data = user_obj.data
-                profile_image = getattr(user_data, 'profile_image_url', '') or getattr(user_data, 'profilePicture', '') or ''
-                return {
-                    "users": [{
-                        "id": str(getattr(user_data, 'id', '')),
-                        "username": getattr(user_data, 'username', clean_query),
-                        "name": getattr(user_data, 'name', clean_query),
-                        "profile_image_url": profile_image,
-                        "verified": getattr(user_data, 'verified', False) or getattr(user_data, 'isBlueVerified', False)
-                    }]
-                }
-            elif hasattr(user_obj, 'id'):
-                # HTTP client returns user directly
-                profile_image = getattr(user_obj, 'profile_image_url', '') or getattr(user_obj, 'profilePicture', '') or ''
-                return {
-                    "users": [{
-                        "id": str(user_obj.id),
-                        "username": getattr(user_obj, 'username', clean_query),
-                        "name": getattr(user_obj, 'name', clean_query),
-                        "profile_image_url": profile_image,
-                        "verified": getattr(user_obj, 'verified', False) or getattr(user_obj, 'isBlueVerified', False)
-                    }]
-                }
-        
-        result = {"users": []}
-        _cache_user_search(query, result)
-        return result
-    except Exception as e:
-        print(f"Error searching users: {e}")
-        import traceback
-        traceback.print_exc()
-        result = {"users": []}
-        _cache_user_search(query, result)
-        return result
+    # Concurrent keystrokes for the same handle share one X API call. Only a new
+    # lookup costs a call, so joining one in flight doesn't spend the user's budget
+    # (no await between the check and single_flight, so it can't go stale)
+    flight_key = ("search-users", cache_key)
+    if flight_key not in _inflight and not _allow_user_search(user_id):
+        return {"users": []}
+    
+    return await single_flight(flight_key, _search_user, clean_query)
 
 
 @app.post("/api/onboarding/connect-x")
-async def connect_x_endpoint(request: Request):
+async def connect_x_endpoint(request: Request, user_id: CurrentUserId):
     """Step 1: Connect X account"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         x_username = data.get("x_username", "").strip().replace("@", "")
         
         if not x_username:
             raise HTTPException(status_code=400, detail="X username required")
         
-        from onboarding_flow import connect_x_account
-        result = connect_x_account(user.get("user_id"), x_username)
+        result = await run_in_threadpool(connect_x_account, user_id, x_username)
         return result
-    except requests.exceptions.ReadTimeout:
-        raise HTTPException(status_code=504, detail="Connection timed out. The X API is slow right now. Please try again.")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=503, detail=f"Network error: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = str(e)
         if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
@@ -613,262 +758,213 @@ async def connect_x_endpoint(request: Request):
         raise HTTPException(status_code=500, detail=error_msg)
 
 
-@app.post("/api/onboarding/analyze-keywords")
-async def analyze_keywords_endpoint(request: Request):
-    """Analyze keywords with AI before saving"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        data = await request.json()
-        keywords_text = data.get("keywords", "").strip()
-        
-        if not keywords_text:
-            raise HTTPException(status_code=400, detail="Keywords required")
-        
-        # Parse keywords
-        keywords = [k.strip() for k in keywords_text.replace('\n', ',').split(',') if k.strip()]
-        
-        if len(keywords) < 3:
-            return {
-                "success": False,
-                "error": "Please provide at least 3 keywords",
-                "suggestions": []
-            }
-        
-        # Analyze keywords with AI - enhanced semantic expansion
-        from services.ai_service import client as ai_client, expand_keywords_semantically, generate_search_queries
-        if not ai_client:
-            return {
-                "success": True,
-                "keywords": keywords,
-                "analysis": "Keywords accepted",
-                "suggestions": [],
-                "expanded_keywords": {},
-                "search_queries": []
-            }
-        
-        try:
-            # Expand keywords semantically
-            expansion = expand_keywords_semantically(keywords)
-            expanded_keywords = expansion.get("expanded_keywords", {})
-            themes = expansion.get("themes", [])
-            context = expansion.get("context", "")
-            
-            # Generate optimized search queries
-            search_queries = generate_search_queries(keywords, context)
-            
-            # Also do basic analysis for backward compatibility
-            keywords_str = ", ".join(keywords)
-            prompt = f"""Analyze these keywords for X/Twitter content discovery: {keywords_str}
+# Keyword analyses keyed by a hash of the normalized keyword set (1 hour TTL)
+_keyword_analysis_cache = {}
+_keyword_analysis_ttl = 3600  # seconds
+_keyword_analysis_max_size = 1000
+
+KEYWORD_ANALYSIS_SYSTEM_PROMPT = """You are an expert at analyzing keywords for social media content discovery. Provide concise, actionable feedback.
+
+Analyze the keywords the user gives you for X/Twitter content discovery.
 
 Provide:
 1. Relevance score (1-10) for each keyword
 2. Suggestions for better or more specific keywords if needed
 3. Any overlapping or redundant keywords
 
-Format as JSON with:
-- "relevance": {{"keyword": score}}
+Respond with a JSON object with:
+- "relevance": {"keyword": score}
 - "suggestions": ["suggestion1", "suggestion2"]
 - "overlapping": ["keyword1", "keyword2"] if any overlap
 - "summary": "brief analysis"
 """
-            
-            response = ai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert at analyzing keywords for social media content discovery. Provide concise, actionable feedback."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            analysis_text = response.choices[0].message.content
-            
-            # Try to parse JSON from response
-            import json
-            import re
-            json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-            if json_match:
-                analysis = json.loads(json_match.group())
-            else:
-                analysis = {"summary": analysis_text}
-            
-            return {
-                "success": True,
-                "keywords": keywords,
-                "ai_analysis": analysis.get("summary", analysis_text) if isinstance(analysis, dict) else analysis_text,
-                "analysis": analysis,
-                "suggestions": analysis.get("suggestions", []) if isinstance(analysis, dict) else [],
-                "expanded_keywords": expanded_keywords,
-                "themes": themes,
-                "context": context,
-                "search_queries": search_queries[:3]  # Return first 3 queries as preview
-            }
-        except Exception as e:
-            print(f"AI analysis error: {e}")
-            return {
-                "success": True,
-                "keywords": keywords,
-                "ai_analysis": "Keywords accepted (AI analysis unavailable)",
-                "analysis": {"summary": "Keywords accepted"},
-                "suggestions": [],
-                "expanded_keywords": {},
-                "search_queries": []
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/onboarding/keywords")
-async def save_keywords_endpoint(request: Request):
-    """Step 2: Save user keywords"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        data = await request.json()
-        keywords = data.get("keywords", [])
-        
-        from onboarding_flow import save_keywords
-        result = save_keywords(user.get("user_id"), keywords)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def _keyword_analysis_key(keywords: List[str]) -> str:
+    """Order- and case-insensitive cache key for a keyword set"""
+    normalized = ",".join(sorted({k.lower() for k in keywords}))
+    return hashlib.sha256(normalized.encode()).hexdigest()
 
 
-@app.post("/api/onboarding/relevance")
-async def save_relevance_endpoint(request: Request, background_tasks: BackgroundTasks):
-    """Step 3: Save keyword relevance preferences"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+@app.post("/api/onboarding/analyze-keywords")
+async def analyze_keywords_endpoint(request: Request, user_id: CurrentUserId):
+    """Analyze keywords with AI before saving"""
+    data = orjson.loads(await request.body())
+    keywords_text = data.get("keywords", "").strip()
+    
+    if not keywords_text:
+        raise HTTPException(status_code=400, detail="Keywords required")
+    
+    # Parse keywords
+    keywords = [k.strip() for k in keywords_text.replace('\n', ',').split(',') if k.strip()]
+    
+    if len(keywords) < 3:
+        return {
+            "success": False,
+            "error": "Please provide at least 3 keywords",
+            "suggestions": []
+        }
+    
+    # Analyze keywords with AI - enhanced semantic expansion
+    ai_client = ai_service.async_client
+    if not ai_client:
+        return {
+            "success": True,
+            "keywords": keywords,
+            "analysis": "Keywords accepted",
+            "suggestions": [],
+            "expanded_keywords": {},
+            "search_queries": []
+        }
+    
+    # Re-analyzing the same keyword set is served from cache
+    cache_key = _keyword_analysis_key(keywords)
+    cached = _keyword_analysis_cache.get(cache_key)
+    if cached is not None:
+        result, timestamp = cached
+        if time() - timestamp < _keyword_analysis_ttl:
+            return {**result, "keywords": keywords}
+        del _keyword_analysis_cache[cache_key]
     
     try:
-        data = await request.json()
-        keyword_relevance = data.get("keyword_relevance", {})
+        # Expand keywords semantically
+        expansion = await run_in_threadpool(expand_keywords_semantically, keywords)
+        expanded_keywords = expansion.get("expanded_keywords", {})
+        themes = expansion.get("themes", [])
+        context = expansion.get("context", "")
         
-        from onboarding_flow import save_keyword_relevance, _prepare_onboarding_data
+        # Generate optimized search queries
+        search_queries = await run_in_threadpool(generate_search_queries, keywords, context)
         
-        # Save relevance and get result (returns immediately)
-        result = save_keyword_relevance(user.get("user_id"), keyword_relevance)
+        # Also do basic analysis for backward compatibility
+        # The instructions live in a byte-stable system prompt so repeat calls share a cached prefix
+        response = await ai_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": KEYWORD_ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Keywords: {', '.join(keywords)}"}
+            ],
+            temperature=0.7,
+            max_tokens=500,
+            response_format={"type": "json_object"}
+        )
         
-        # Add background task to prepare onboarding data (non-blocking)
-        background_tasks.add_task(_prepare_onboarding_data, user.get("user_id"))
+        analysis_text = response.choices[0].message.content
+        try:
+            analysis = orjson.loads(analysis_text)
+        except orjson.JSONDecodeError:
+            analysis = {"summary": analysis_text}
         
+        result = {
+            "success": True,
+            "keywords": keywords,
+            "ai_analysis": analysis.get("summary", analysis_text) if isinstance(analysis, dict) else analysis_text,
+            "analysis": analysis,
+            "suggestions": analysis.get("suggestions", []) if isinstance(analysis, dict) else [],
+            "expanded_keywords": expanded_keywords,
+            "themes": themes,
+            "context": context,
+            "search_queries": search_queries[:3]  # Return first 3 queries as preview
+        }
+        if len(_keyword_analysis_cache) >= _keyword_analysis_max_size:
+            _keyword_analysis_cache.pop(next(iter(_keyword_analysis_cache)), None)
+        _keyword_analysis_cache[cache_key] = (result, time())
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"AI analysis error: {e}")
+        return {
+            "success": True,
+            "keywords": keywords,
+            "ai_analysis": "Keywords accepted (AI analysis unavailable)",
+            "analysis": {"summary": "Keywords accepted"},
+            "suggestions": [],
+            "expanded_keywords": {},
+            "search_queries": []
+        }
+
+
+@app.post("/api/onboarding/keywords")
+async def save_keywords_endpoint(request: Request, user_id: CurrentUserId):
+    """Step 2: Save user keywords"""
+    data = orjson.loads(await request.body())
+    keywords = data.get("keywords", [])
+    
+    result = await run_in_threadpool(save_keywords, user_id, keywords)
+    return result
+
+
+@app.post("/api/onboarding/relevance")
+async def save_relevance_endpoint(request: Request, background_tasks: BackgroundTasks, user_id: CurrentUserId):
+    """Step 3: Save keyword relevance preferences"""
+    data = orjson.loads(await request.body())
+    keyword_relevance = data.get("keyword_relevance", {})
+    
+    
+    # Save relevance and get result (returns immediately)
+    result = await run_in_threadpool(save_keyword_relevance, user_id, keyword_relevance)
+    
+    # Add background task to prepare onboarding data (non-blocking)
+    background_tasks.add_task(_prepare_onboarding_data, user_id)
+    
+    return result
 
 
 # Interactive Onboarding API
 @app.get("/api/onboarding/interactive/status")
-async def get_interactive_status_endpoint(request: Request):
+def get_interactive_status_endpoint(user_id: CurrentUserId):
     """Get current interactive onboarding status"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_interactive_onboarding_status
-        return get_interactive_onboarding_status(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return get_interactive_onboarding_status(user_id)
 
 
 @app.get("/api/onboarding/interactive/post")
-async def get_interactive_post_endpoint(request: Request, phase: int):
+async def get_interactive_post_endpoint(phase: int, user_id: CurrentUserId):
     """Get next post for interactive onboarding phase"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_next_onboarding_post
-        return get_next_onboarding_post(user.get("user_id"), phase)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_in_threadpool(get_next_onboarding_post, user_id, phase)
 
 
 @app.get("/api/onboarding/interactive/profile")
-async def get_interactive_profile_endpoint(request: Request):
+async def get_interactive_profile_endpoint(user_id: CurrentUserId):
     """Get next profile for phase 4"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_next_onboarding_profile
-        return get_next_onboarding_profile(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await run_in_threadpool(get_next_onboarding_profile, user_id)
 
 
 @app.post("/api/onboarding/interactive/response")
-async def save_interactive_response_endpoint(request: Request):
+async def save_interactive_response_endpoint(request: Request, user_id: CurrentUserId):
     """Save user response and update persona"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        data = await request.json()
-        from onboarding_flow import save_onboarding_response
-        result = save_onboarding_response(
-            user.get("user_id"),
-            data.get("phase"),
-            data.get("post_id"),
-            data.get("account_id"),
-            data.get("response_type"),
-            data.get("response_value")
-        )
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    data = orjson.loads(await request.body())
+    result = await run_in_threadpool(
+        save_onboarding_response,
+        user_id,
+        data.get("phase"),
+        data.get("post_id"),
+        data.get("account_id"),
+        data.get("response_type"),
+        data.get("response_value")
+    )
+    return result
 
 
 @app.post("/api/onboarding/interactive/complete")
-async def complete_interactive_endpoint(request: Request):
+def complete_interactive_endpoint(user_id: CurrentUserId):
     """Mark interactive onboarding as complete"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import complete_interactive_onboarding
-        return complete_interactive_onboarding(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return complete_interactive_onboarding(user_id)
 
 
 @app.post("/api/onboarding/interactive/skip-phase")
-async def skip_phase_endpoint(request: Request):
+def skip_phase_endpoint(user_id: CurrentUserId):
     """Skip current onboarding phase"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import skip_onboarding_phase
-        return skip_onboarding_phase(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return skip_onboarding_phase(user_id)
+
+
+# Tweet URL patterns for the oEmbed fallback
+TWEET_URL_RE = re.compile(r'(?:twitter\.com|x\.com)/([^/]+)/status/(\d+)')
+TWEET_ID_RE = re.compile(r'/status/(\d+)')
 
 
 @app.get("/api/onboarding/oembed")
-async def get_oembed_endpoint(request: Request, url: str):
+async def get_oembed_endpoint(request: Request, url: str, user_id: CurrentUserId):
     """Get X/Twitter oEmbed HTML for a post URL - Always returns proper Twitter embed HTML"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
     try:
-        import httpx
-        import re
-        
         # Clean and validate URL
         url = url.strip()
         if not url.startswith('http'):
@@ -903,37 +999,35 @@ async def get_oembed_endpoint(request: Request, url: str):
         }
         
         try:
-            async with httpx.AsyncClient(timeout=15.0, follow_redirects=True) as client:
-                response = await client.get(oembed_url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                html = data.get("html", "")
-                
-                # Verify we got valid HTML from Twitter
-                if html and ('<blockquote' in html or 'twitter-tweet' in html):
-                    print(f"oEmbed success: Got HTML from Twitter API for {url}")
-                    return {
-                        "success": True,
-                        "html": html,
-                        "width": data.get("width"),
-                        "height": data.get("height"),
-                        "url": url
-                    }
-                else:
-                    print(f"oEmbed warning: Twitter API returned invalid HTML for {url}")
+            response = await request.app.state.http.get(oembed_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+            html = data.get("html", "")
+            
+            # Verify we got valid HTML from Twitter
+            if html and ('<blockquote' in html or 'twitter-tweet' in html):
+                print(f"oEmbed success: Got HTML from Twitter API for {url}")
+                return {
+                    "success": True,
+                    "html": html,
+                    "width": data.get("width"),
+                    "height": data.get("height"),
+                    "url": url
+                }
+            else:
+                print(f"oEmbed warning: Twitter API returned invalid HTML for {url}")
         except httpx.HTTPStatusError as e:
             print(f"oEmbed API HTTP error {e.response.status_code} for {url}: {e.response.text}")
         except httpx.RequestError as e:
             print(f"oEmbed API request error for {url}: {e}")
         except Exception as e:
             print(f"oEmbed API error for {url}: {e}")
-            import traceback
             traceback.print_exc()
         
         # Fallback: Construct proper Twitter embed blockquote HTML
         # This will be rendered by Twitter widgets.js
         print(f"oEmbed fallback: Constructing blockquote HTML for {url}")
-        tweet_match = re.search(r'(?:twitter\.com|x\.com)/([^/]+)/status/(\d+)', url)
+        tweet_match = TWEET_URL_RE.search(url)
         if tweet_match:
             username = tweet_match.group(1)
             tweet_id = tweet_match.group(2)
@@ -943,7 +1037,7 @@ async def get_oembed_endpoint(request: Request, url: str):
             </blockquote>'''
         else:
             # Try to extract just tweet ID
-            tweet_id_match = re.search(r'/status/(\d+)', url)
+            tweet_id_match = TWEET_ID_RE.search(url)
             tweet_id = tweet_id_match.group(1) if tweet_id_match else None
             
             if tweet_id:
@@ -969,7 +1063,6 @@ async def get_oembed_endpoint(request: Request, url: str):
         }
     except Exception as e:
         print(f"Error fetching oEmbed for {url}: {e}")
-        import traceback
         traceback.print_exc()
         return {
             "success": False,
@@ -978,109 +1071,21 @@ async def get_oembed_endpoint(request: Request, url: str):
         }
 
 
-# Interactive Onboarding API
-@app.get("/api/onboarding/interactive/status")
-async def get_interactive_status_endpoint(request: Request):
-    """Get current interactive onboarding status"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_interactive_onboarding_status
-        return get_interactive_onboarding_status(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.get("/api/onboarding/interactive/post")
-async def get_interactive_post_endpoint(request: Request, phase: int):
-    """Get next post for interactive onboarding phase"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_next_onboarding_post
-        return get_next_onboarding_post(user.get("user_id"), phase)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.get("/api/onboarding/interactive/profile")
-async def get_interactive_profile_endpoint(request: Request):
-    """Get next profile for phase 4"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import get_next_onboarding_profile
-        return get_next_onboarding_profile(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.post("/api/onboarding/interactive/response")
-async def save_interactive_response_endpoint(request: Request):
-    """Save user response and update persona"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        data = await request.json()
-        from onboarding_flow import save_onboarding_response
-        result = save_onboarding_response(
-            user.get("user_id"),
-            data.get("phase"),
-            data.get("post_id"),
-            data.get("account_id"),
-            data.get("response_type"),
-            data.get("response_value")
-        )
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.post("/api/onboarding/interactive/complete")
-async def complete_interactive_endpoint(request: Request):
-    """Mark interactive onboarding as complete"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from onboarding_flow import complete_interactive_onboarding
-        return complete_interactive_onboarding(user.get("user_id"))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
 @app.post("/api/onboarding/phase1")
-async def onboarding_phase1_endpoint(request: Request, username: Optional[str] = None):
+async def onboarding_phase1_endpoint(user: CurrentUser, username: Optional[str] = None):
     """Run Phase 1 onboarding (passive ingestion) - Legacy endpoint"""
-    user = await get_current_user_from_request(request)
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
     # Use user's X username if available
     if not username:
         username = user.get("x_username")
     
-    try:
-        result = run_onboarding_phase1(username)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    result = await run_in_threadpool(run_onboarding_phase1, username)
+    return result
 
 
 @app.get("/api/health/keys")
 async def health_check_keys():
     """Check status of API keys"""
-    from services.ai_service import validate_openai_key, client as ai_client
-    import config
+    ai_client = ai_service.client
     
     # Quick check: if client exists and key format is correct, assume valid
     # Full validation can be slow, so we do a quick check first
@@ -1131,12 +1136,71 @@ async def health_check_keys():
     }
 
 
+def _find_duplicate_routes() -> List[str]:
+    """Method/path pairs registered more than once (only the first registration is ever dispatched)"""
+    seen = set()
+    duplicates = []
+    for route in app.routes:
+        for method in getattr(route, "methods", None) or ("*",):
+            key = (method, route.path)
+            if key in seen:
+                duplicates.append(f"{method} {route.path}")
+            seen.add(key)
+    return duplicates
+
+
+_duplicate_routes = _find_duplicate_routes()
+if _duplicate_routes:
+    raise RuntimeError(f"Duplicate routes registered: {', '.join(_duplicate_routes)}")
+
+
+# Background maintenance run by the startup handler
+SESSION_SWEEP_INTERVAL = 600  # seconds
+DEFERRED_WRITE_INTERVAL = 5  # seconds
+
+
+async def _sweep_expired_sessions() -> None:
+    """Periodically drop expired sessions so logins never pay for the cleanup"""
+    while True:
+        try:
+            await run_in_threadpool(purge_expired_sessions)
+        except Exception as e:
+            print(f"Error sweeping expired sessions: {e}")
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+
+
+def _flush_deferred_writes_sync() -> None:
+    """Write deferred account and persona updates"""
+    flush_pending_users()
+    flush_persona_states()
+
+
+async def _flush_deferred_writes() -> None:
+    """Write deferred updates every few seconds (one write per file per interval)"""
+    while True:
+        await asyncio.sleep(DEFERRED_WRITE_INTERVAL)
+        try:
+            await run_in_threadpool(_flush_deferred_writes_sync)
+        except Exception as e:
+            print(f"Error flushing deferred writes: {e}")
+
+
 # Startup event to validate API keys
 @app.on_event("startup")
 async def startup_event():
     """Validate API keys on startup and log warnings"""
-    from services.ai_service import validate_openai_key
-    import config
+    # Blocking feature calls run in the threadpool; raise its default cap of 40
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 200
+    
+    # Shared outbound HTTP client (keeps connections alive across requests)
+    app.state.http = httpx.AsyncClient(
+        timeout=15.0,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+    
+    app.state.session_sweeper = asyncio.create_task(_sweep_expired_sessions())
+    app.state.write_flusher = asyncio.create_task(_flush_deferred_writes())
     
     # Check OpenAI API key
     openai_status = validate_openai_key()
@@ -1154,7 +1218,18 @@ async def startup_event():
         print("✓ X API key is configured")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks, flush deferred writes and close shared clients"""
+    app.state.session_sweeper.cancel()
+    app.state.write_flusher.cancel()
+    await run_in_threadpool(_flush_deferred_writes_sync)
+    await app.state.http.aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # uvloop + httptools come with uvicorn[standard]. Stay on a single worker:
+    # the JSON data files and in-process caches assume one process.
+    uvicorn.run("app:app", host=config.HOST, port=config.PORT, loop="uvloop", http="httptools")
 
@@ -3,13 +3,13 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables (once per process; workers forked after import inherit them)
 load_dotenv()
 
 # Base directory
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 # X/Twitter API Configuration
 X_API_KEY = os.getenv("X_API_KEY")
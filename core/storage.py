@@ -0,0 +1,351 @@
+"""SQLite storage for scheduled posts and login sessions, plus atomic JSON file writes"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator
+import config
+
+# Single database file for the deployment
+DB_FILE = config.DATA_DIR / "app.db"
+
+# One connection per thread (sqlite3 connections must not be shared across threads)
+_local = threading.local()
+
+# Owners whose legacy JSON schedule has already been imported (skips the check query)
+_imported_owners = set()
+
+# Legacy JSON files already imported into their tables
+_imported_files = set()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    id TEXT,
+    status TEXT,
+    scheduled_date TEXT,
+    scheduled_time TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_posts_owner_sched ON posts(owner, scheduled_date, scheduled_time);
+CREATE INDEX IF NOT EXISTS ix_posts_owner_id ON posts(owner, id);
+CREATE INDEX IF NOT EXISTS ix_posts_owner_status ON posts(owner, status, scheduled_date, scheduled_time);
+CREATE TABLE IF NOT EXISTS imported_schedules (
+    owner TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions(expires);
+CREATE TABLE IF NOT EXISTS imported_files (
+    name TEXT PRIMARY KEY
+);
+"""
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """
+    Replace a file's contents so readers see either the old or the new file
+    
+    Writes a temp file in the same directory, fsyncs it once and renames it
+    over path, so a crash mid-write can't leave truncated JSON behind.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def get_conn() -> sqlite3.Connection:
+    """Get this thread's WAL-mode connection, opening it on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _owner(user_id: Optional[str]) -> str:
+    """Map user_id to the owner column ('' is the legacy global schedule)"""
+    return user_id or ""
+
+
+def _row_values(owner: str, post: Dict[str, Any]) -> tuple:
+    """Column values for a post row"""
+    return (
+        owner,
+        post.get("id"),
+        post.get("status"),
+        post.get("scheduled_date"),
+        post.get("scheduled_time"),
+        json.dumps(post, ensure_ascii=False)
+    )
+
+
+def import_json_schedule(user_id: Optional[str], schedule_file: Path) -> None:
+    """One-time import of a legacy content_schedule.json into the posts table"""
+    owner = _owner(user_id)
+    if owner in _imported_owners:
+        return
+    conn = get_conn()
+    if conn.execute("SELECT 1 FROM imported_schedules WHERE owner = ?", (owner,)).fetchone():
+        _imported_owners.add(owner)
+        return
+
+    posts = []
+    if schedule_file.exists():
+        try:
+            with open(schedule_file, 'r', encoding='utf-8') as f:
+                posts = json.load(f).get("posts", [])
+        except (json.JSONDecodeError, IOError):
+            posts = []
+
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO imported_schedules (owner) VALUES (?)", (owner,))
+        conn.executemany(
+            "INSERT INTO posts (owner, id, status, scheduled_date, scheduled_time, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(owner, post) for post in posts]
+        )
+    _imported_owners.add(owner)
+
+
+def load_posts(user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """All posts for an owner in insertion order"""
+    rows = get_conn().execute(
+        "SELECT data FROM posts WHERE owner = ? ORDER BY seq", (_owner(user_id),)
+    ).fetchall()
+    return [json.loads(data) for (data,) in rows]
+
+
+def query_posts_in_range(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    user_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Posts with a scheduled_date inside [start_date, end_date], ordered by date and time"""
+    sql = "SELECT data FROM posts WHERE owner = ? AND scheduled_date IS NOT NULL AND scheduled_date != ''"
+    params = [_owner(user_id)]
+    if start_date:
+        sql += " AND scheduled_date >= ?"
+        params.append(start_date)
+    if end_date:
+        sql += " AND scheduled_date <= ?"
+        params.append(end_date)
+    sql += " ORDER BY scheduled_date, COALESCE(scheduled_time, ''), seq"
+    return [json.loads(data) for (data,) in get_conn().execute(sql, params).fetchall()]
+
+
+def iter_post_json(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[str] = None,
+    page_size: int = 200
+) -> Iterator[str]:
+    """
+    Stored JSON of an owner's posts, page by page
+    
+    Without a range posts come in insertion order, otherwise only dated posts
+    inside [start_date, end_date] in date/time order (same as load_posts /
+    query_posts_in_range). Pages use keyset pagination and a fresh query each,
+    so consecutive pages may be fetched from different threads.
+    """
+    ranged = bool(start_date or end_date)
+    if ranged:
+        sql = ("SELECT data, scheduled_date, COALESCE(scheduled_time, ''), seq FROM posts "
+               "WHERE owner = ? AND scheduled_date IS NOT NULL AND scheduled_date != ''")
+        params = [_owner(user_id)]
+        if start_date:
+            sql += " AND scheduled_date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND scheduled_date <= ?"
+            params.append(end_date)
+        after = " AND (scheduled_date, COALESCE(scheduled_time, ''), seq) > (?, ?, ?)"
+        order = " ORDER BY scheduled_date, COALESCE(scheduled_time, ''), seq LIMIT ?"
+    else:
+        sql = "SELECT data, seq FROM posts WHERE owner = ?"
+        params = [_owner(user_id)]
+        after = " AND seq > ?"
+        order = " ORDER BY seq LIMIT ?"
+    
+    last_key = None
+    while True:
+        if last_key is None:
+            rows = get_conn().execute(sql + order, (*params, page_size)).fetchall()
+        else:
+            rows = get_conn().execute(sql + after + order, (*params, *last_key, page_size)).fetchall()
+        for row in rows:
+            yield row[0]
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][1:]
+
+
+def query_posts_by_status(
+    status: str,
+    until_date: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Posts with a status (optionally scheduled on or before until_date), ordered by date and time"""
+    sql = "SELECT data FROM posts WHERE owner = ? AND status = ?"
+    params = [_owner(user_id), status]
+    if until_date:
+        sql += " AND scheduled_date <= ?"
+        params.append(until_date)
+    sql += " ORDER BY scheduled_date, scheduled_time, seq"
+    return [json.loads(data) for (data,) in get_conn().execute(sql, params).fetchall()]
+
+
+def get_post(post_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """First post with this id for an owner (indexed lookup)"""
+    row = get_conn().execute(
+        "SELECT data FROM posts WHERE owner = ? AND id = ? ORDER BY seq LIMIT 1",
+        (_owner(user_id), post_id)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def insert_posts(posts: List[Dict[str, Any]], user_id: Optional[str] = None) -> None:
+    """Append posts for an owner"""
+    owner = _owner(user_id)
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT INTO posts (owner, id, status, scheduled_date, scheduled_time, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(owner, post) for post in posts]
+        )
+
+
+def update_post_row(post_id: str, post: Dict[str, Any], user_id: Optional[str] = None) -> bool:
+    """Overwrite the first post with this id; returns False if there is none"""
+    owner = _owner(user_id)
+    conn = get_conn()
+    with conn:
+        row = conn.execute(
+            "SELECT seq FROM posts WHERE owner = ? AND id = ? ORDER BY seq LIMIT 1", (owner, post_id)
+        ).fetchone()
+        if not row:
+            return False
+        values = _row_values(owner, post)[1:]
+        conn.execute(
+            "UPDATE posts SET id = ?, status = ?, scheduled_date = ?, scheduled_time = ?, data = ? WHERE seq = ?",
+            (*values, row[0])
+        )
+    return True
+
+
+def delete_post_row(post_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Delete the first post with this id and return it"""
+    owner = _owner(user_id)
+    conn = get_conn()
+    with conn:
+        row = conn.execute(
+            "SELECT seq, data FROM posts WHERE owner = ? AND id = ? ORDER BY seq LIMIT 1", (owner, post_id)
+        ).fetchone()
+        if not row:
+            return None
+        conn.execute("DELETE FROM posts WHERE seq = ?", (row[0],))
+    return json.loads(row[1])
+
+
+def replace_posts(posts: List[Dict[str, Any]], user_id: Optional[str] = None) -> None:
+    """Replace an owner's whole schedule in one transaction"""
+    owner = _owner(user_id)
+    conn = get_conn()
+    with conn:
+        conn.execute("DELETE FROM posts WHERE owner = ?", (owner,))
+        conn.executemany(
+            "INSERT INTO posts (owner, id, status, scheduled_date, scheduled_time, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [_row_values(owner, post) for post in posts]
+        )
+
+
+def _iso_to_epoch(value: Optional[str]) -> float:
+    """Legacy ISO timestamp as a UNIX time (0 when missing or malformed)"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def import_json_sessions(sessions_file: Path) -> None:
+    """One-time import of a legacy sessions.json into the sessions table"""
+    if "sessions" in _imported_files:
+        return
+    conn = get_conn()
+    if conn.execute("SELECT 1 FROM imported_files WHERE name = 'sessions'").fetchone():
+        _imported_files.add("sessions")
+        return
+    
+    sessions = {}
+    if sessions_file.exists():
+        try:
+            with open(sessions_file, 'r', encoding='utf-8') as f:
+                sessions = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            sessions = {}
+    
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO imported_files (name) VALUES ('sessions')")
+        conn.executemany(
+            "INSERT OR IGNORE INTO sessions (token, user_id, created_at, expires) VALUES (?, ?, ?, ?)",
+            [
+                (token, data["user_id"], _iso_to_epoch(data.get("created_at")), _iso_to_epoch(data.get("expires")))
+                for token, data in sessions.items()
+                if data.get("user_id")
+            ]
+        )
+    _imported_files.add("sessions")
+
+
+def insert_session(token: str, user_id: str, created_at: float, expires: float) -> None:
+    """Store a new session (times are UNIX timestamps)"""
+    conn = get_conn()
+    with conn:
+        conn.execute(
+            "INSERT INTO sessions (token, user_id, created_at, expires) VALUES (?, ?, ?, ?)",
+            (token, user_id, created_at, expires)
+        )
+
+
+def get_session(token: str) -> Optional[Dict[str, Any]]:
+    """Session row for a token (primary-key lookup)"""
+    row = get_conn().execute(
+        "SELECT user_id, created_at, expires FROM sessions WHERE token = ?", (token,)
+    ).fetchone()
+    if not row:
+        return None
+    return {"user_id": row[0], "created_at": row[1], "expires": row[2]}
+
+
+def delete_session(token: str) -> None:
+    """Delete a session by token"""
+    conn = get_conn()
+    with conn:
+        conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+
+def delete_expired_sessions(now: float) -> int:
+    """Delete sessions that expired before now; returns how many were removed"""
+    conn = get_conn()
+    with conn:
+        return conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,)).rowcount
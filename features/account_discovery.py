@@ -1,11 +1,144 @@
 
 """Account Discovery Feature - Find relevant accounts based on keywords and criteria"""
+import heapq
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from time import monotonic
 from typing import List, Dict, Any, Optional
 from services.x_api import client
 from services.ai_service import expand_keywords_semantically, generate_search_queries, analyze_post_relevance
 import config
 
 
+# Upper bound on onboarding search queries sent in parallel (each is one X API round trip)
+MAX_PARALLEL_SEARCHES = 5
+
+# X API responses reused across calls: a search for 5 minutes, a user lookup for an hour.
+# Entries are (value, monotonic timestamp).
+_search_cache = {}
+_search_cache_ttl = 300  # seconds
+_user_cache = {}
+_user_cache_ttl = 3600  # seconds
+_api_cache_max_size = 4096
+_api_cache_lock = threading.Lock()  # Searches run on a thread pool; guards both caches
+
+
+def _cache_get(cache: Dict, key: Any, ttl: float) -> Any:
+    """Cached value for key, or None if missing or expired"""
+    with _api_cache_lock:
+        entry = cache.get(key)
+        if entry is not None:
+            value, cached_at = entry
+            if monotonic() - cached_at < ttl:
+                return value
+            del cache[key]
+        return None
+
+
+def _cache_put(cache: Dict, key: Any, value: Any, ttl: float) -> None:
+    """Cache a value; keeps the cache bounded by dropping expired entries, then the oldest"""
+    with _api_cache_lock:
+        cache[key] = (value, monotonic())
+        if len(cache) > _api_cache_max_size:
+            now = monotonic()
+            for k in [k for k, (_, ts) in cache.items() if now - ts >= ttl]:
+                del cache[k]
+            while len(cache) > _api_cache_max_size:
+                del cache[next(iter(cache))]
+
+
+def _search_cached(
+    query: str,
+    max_results: int,
+    tweet_fields: List[str],
+    user_fields: List[str],
+    expansions: Optional[List[str]] = None
+) -> Any:
+    """client.search_recent_tweets, reusing a non-empty response for the same search"""
+    key = (query, max_results, tuple(tweet_fields), tuple(user_fields), tuple(expansions or ()))
+    tweets = _cache_get(_search_cache, key, _search_cache_ttl)
+    if tweets is None:
+        extra = {'expansions': expansions} if expansions else {}
+        tweets = client.search_recent_tweets(
+            query=query,
+            max_results=max_results,
+            tweet_fields=tweet_fields,
+            user_fields=user_fields,
+            **extra
+        )
+        # Empty responses may be transient errors from the HTTP client; don't pin them
+        if tweets and tweets.data:
+            _cache_put(_search_cache, key, tweets, _search_cache_ttl)
+    return tweets
+
+
+def _get_users_cached(ids: List[str], user_fields: Optional[List[str]] = None) -> List[Any]:
+    """
+    User objects for ids, cached per (id, user_fields)
+    
+    Only ids not in the cache are fetched, in batches of 100. A failed batch is
+    logged and skipped, so the result may miss some ids.
+    """
+    fields = tuple(user_fields or ())
+    users = []
+    missing = []
+    for user_id in ids:
+        user = _cache_get(_user_cache, (user_id, fields), _user_cache_ttl)
+        if user is None:
+            missing.append(user_id)
+        else:
+            users.append(user)
+    
+    # Process in batches of 100 to avoid API limits
+    for i in range(0, len(missing), 100):
+        batch_ids = missing[i:i+100]
+        try:
+            if user_fields:
+                response = client.get_users(ids=batch_ids, user_fields=user_fields)
+            else:
+                response = client.get_users(ids=batch_ids)
+        except Exception as e:
+            print(f"Error fetching user batch: {e}")
+            continue
+        
+        users_data = None
+        if hasattr(response, 'data'):
+            users_data = response.data
+        elif isinstance(response, list):
+            users_data = response
+        elif hasattr(response, 'users'):
+            users_data = response.users
+        
+        for user in users_data or []:
+            user_id = user.id if hasattr(user, 'id') else (user.get('id') if isinstance(user, dict) else None)
+            if user_id:
+                _cache_put(_user_cache, (str(user_id), fields), user, _user_cache_ttl)
+            users.append(user)
+    return users
+
+
+def _keyword_matcher(keyword_lowers) -> tuple:
+    """
+    Regex finding which lowercased keywords occur in a lowercased text
+    
+    Returns (pattern, keyword_within); pattern is None if there are no keywords.
+    The lookahead reports a match at every position, longest keyword first, so
+    a keyword only hidden inside a longer match at the same position (e.g. "ai"
+    in "ai tools") is recovered through keyword_within[hit], the keywords that
+    are substrings of hit. Together they give the same result as testing each
+    keyword with `in`.
+    """
+    distinct = sorted({k for k in keyword_lowers if k}, key=len, reverse=True)
+    if not distinct:
+        return None, {}
+    pattern = re.compile('(?=(' + '|'.join(map(re.escape, distinct)) + '))')
+    keyword_within = {hit: {k for k in distinct if k in hit} for hit in distinct}
+    return pattern, keyword_within
+
+
 def search_accounts_by_keywords(
     keywords: List[str],
     min_followers: int = 1000,
@@ -28,6 +161,10 @@ def search_accounts_by_keywords(
         return []
     
     accounts = []
+    # Best max_results accounts so far, as a min-heap of (relevance_score, -arrival, account)
+    # so the weakest (latest on ties) is dropped first and the rest are never kept
+    top_accounts = []
+    seen_ids = set()  # Account ids already scored
     
     try:
         # OPTIMIZATION: Combine all keywords into single OR query instead of multiple searches
@@ -40,12 +177,13 @@ def search_accounts_by_keywords(
         combined_query = f"({keyword_query}) -is:retweet lang:en"
         
         try:
-            # Single search call for all keywords
-            tweets = client.search_recent_tweets(
-                query=combined_query,
-                max_results=min(100, max_results * 3),  # Get more tweets to filter from
+            # Single search call for all keywords; authors come back in includes['users']
+            tweets = _search_cached(
+                combined_query,
+                min(100, max_results * 3),  # Get more tweets to filter from
                 tweet_fields=['author_id', 'public_metrics', 'created_at'],
-                user_fields=['username', 'name', 'description', 'public_metrics', 'verified']
+                user_fields=['username', 'name', 'description', 'public_metrics', 'verified', 'profile_image_url'],
+                expansions=['author_id']
             )
         except Exception as api_error:
             # Handle 401 Unauthorized and other API errors gracefully
@@ -60,6 +198,10 @@ def search_accounts_by_keywords(
         if not tweets or not tweets.data:
             return accounts
         
+        # Lowercase each keyword once, not once per tweet and per account
+        keyword_lowers = {keyword: keyword.lower() for keyword in keywords}
+        keyword_pattern, keyword_within = _keyword_matcher(keyword_lowers.values())
+        
         # Get unique authors from all tweets
         author_ids = set()
         author_keyword_map = {}  # Track which keywords matched for each author
@@ -69,108 +211,101 @@ def search_accounts_by_keywords(
                 author_id = str(tweet.author_id)
                 author_ids.add(author_id)
                 
-                # Track which keywords this tweet matches
-                tweet_text = (tweet.text or '').lower()
-                for keyword in keywords:
-                    if keyword.lower() in tweet_text:
+                # Track which keywords this tweet matches (one regex scan per tweet)
+                hits = set(keyword_pattern.findall((tweet.text or '').lower())) if keyword_pattern else None
+                if not hits:
+                    continue
+                found = set().union(*(keyword_within[hit] for hit in hits))
+                for keyword, keyword_lower in keyword_lowers.items():
+                    if keyword_lower in found:
                         if author_id not in author_keyword_map:
                             author_keyword_map[author_id] = []
                         if keyword not in author_keyword_map[author_id]:
                             author_keyword_map[author_id].append(keyword)
         
-        # Fetch user details for authors in batches
-        if author_ids:
-            user_ids_list = list(author_ids)
-            # Process in batches of 100 to avoid API limits
-            for i in range(0, len(user_ids_list), 100):
-                batch_ids = user_ids_list[i:i+100]
-                try:
-                    users = client.get_users(ids=batch_ids, user_fields=[
-                        'username', 'name', 'description', 'public_metrics', 'verified', 'profile_image_url'
-                    ])
-                    
-                    users_data = None
-                    if hasattr(users, 'data'):
-                        users_data = users.data
-                    elif isinstance(users, list):
-                        users_data = users
-                    elif hasattr(users, 'users'):
-                        users_data = users.users
-                    
-                    if users_data:
-                        for user in users_data:
-                            user_id = str(user.id if hasattr(user, 'id') else (user.get('id') if isinstance(user, dict) else ''))
-                            if not user_id:
-                                continue
-                            
-                            metrics = user.public_metrics
-                            # Handle both dict and object metrics
-                            if hasattr(metrics, 'followers_count'):
-                                followers = getattr(metrics, 'followers_count', 0)
-                                following_count = getattr(metrics, 'following_count', 0)
-                                tweet_count = getattr(metrics, 'tweet_count', 0)
-                            elif isinstance(metrics, dict):
-                                followers = metrics.get('followers_count', 0)
-                                following_count = metrics.get('following_count', 0)
-                                tweet_count = metrics.get('tweet_count', 0)
-                            else:
-                                followers = 0
-                                following_count = 0
-                                tweet_count = 0
-                            
-                            # Filter by criteria
-                            if followers < min_followers:
-                                continue
-                            
-                            # Calculate engagement rate (simplified)
-                            engagement_rate = 0.02  # Placeholder
-                            
-                            if engagement_rate < min_engagement_rate:
-                                continue
-                            
-                            # Check if account already in results
-                            if any(acc.get('id') == user_id for acc in accounts):
-                                continue
-                            
-                            # Calculate relevance score based on matched keywords
-                            matched_keywords = author_keyword_map.get(user_id, keywords[:1])  # Fallback to first keyword
-                            relevance_score = 0.0
-                            for keyword in matched_keywords:
-                                score = _calculate_relevance(user, keyword, keywords)
-                                relevance_score = max(relevance_score, score)  # Use highest score
-                            
-                            accounts.append({
-                                'id': user_id,
-                                'username': user.username if hasattr(user, 'username') else (user.get('username') if isinstance(user, dict) else ''),
-                                'name': (user.name if hasattr(user, 'name') else (user.get('name') if isinstance(user, dict) else '')) or (user.username if hasattr(user, 'username') else ''),
-                                'description': user.description if hasattr(user, 'description') else (user.get('description') if isinstance(user, dict) else ''),
-                                'followers': followers,
-                                'following': following_count,
-                                'tweets': tweet_count,
-                                'verified': user.verified if hasattr(user, 'verified') else (user.get('verified') or user.get('isBlueVerified', False) if isinstance(user, dict) else False),
-                                'profile_image_url': user.profile_image_url if hasattr(user, 'profile_image_url') else (user.get('profile_image_url') or user.get('profilePicture', '') if isinstance(user, dict) else ''),
-                                'relevance_score': relevance_score,
-                                'matched_keywords': matched_keywords
-                            })
-                except Exception as e:
-                    print(f"Error fetching user batch: {e}")
-                    continue
-        
-        # Sort by relevance score
-        accounts.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
-        
-        # Remove duplicates and limit results
-        seen = set()
-        unique_accounts = []
-        for acc in accounts:
-            acc_id = acc.get('id')
-            if acc_id and acc_id not in seen:
-                seen.add(acc_id)
-                unique_accounts.append(acc)
-                if len(unique_accounts) >= max_results:
-                    break
+        # Author details come with the search; look up only authors it left out
+        includes = getattr(tweets, 'includes', None) or {}
+        users = list(includes.get('users') or [])
+        missing_ids = author_ids.difference(str(user.id) for user in users)
+        if missing_ids:
+            users.extend(_get_users_cached(list(missing_ids), [
+                'username', 'name', 'description', 'public_metrics', 'verified', 'profile_image_url'
+            ]))
+        for user in users:
+            user_id = str(user.id if hasattr(user, 'id') else (user.get('id') if isinstance(user, dict) else ''))
+            if not user_id:
+                continue
+            
+            metrics = user.public_metrics
+            # Handle both dict and object metrics
+            if hasattr(metrics, 'followers_count'):
+                followers = getattr(metrics, 'followers_count', 0)
+                following_count = getattr(metrics, 'following_count', 0)
+                tweet_count = getattr(metrics, 'tweet_count', 0)
+            elif isinstance(metrics, dict):
+                followers = metrics.get('followers_count', 0)
+                following_count = metrics.get('following_count', 0)
+                tweet_count = metrics.get('tweet_count', 0)
+            else:
+                followers = 0
+                following_count = 0
+                tweet_count = 0
+            
+            # Filter by criteria
+            if followers < min_followers:
+                continue
+            
+            # Calculate engagement rate (simplified)
+            engagement_rate = 0.02  # Placeholder
+            
+            if engagement_rate < min_engagement_rate:
+                continue
+            
+            # Check if account already in results
+            if user_id in seen_ids:
+                continue
+            
+            # Read each profile field once; it feeds both the score and the result
+            is_dict = isinstance(user, dict)
+            username = user.username if hasattr(user, 'username') else (user.get('username') if is_dict else '')
+            name = user.name if hasattr(user, 'name') else (user.get('name') if is_dict else '')
+            description = user.description if hasattr(user, 'description') else (user.get('description') if is_dict else '')
+            verified = user.verified if hasattr(user, 'verified') else (user.get('verified') or user.get('isBlueVerified', False) if is_dict else False)
+            
+            # Calculate relevance score based on matched keywords
+            matched_keywords = author_keyword_map.get(user_id, keywords[:1])  # Fallback to first keyword
+            description_lower = (description or '').lower()
+            name_lower = (name or '').lower()
+            relevance_score = 0.0
+            for keyword in matched_keywords:
+                score = _calculate_relevance(
+                    description_lower, name_lower, keyword_lowers[keyword], verified
+                )
+                relevance_score = max(relevance_score, score)  # Use highest score
+            
+            account = {
+                'id': user_id,
+                'username': username,
+                'name': name or username,
+                'description': description,
+                'followers': followers,
+                'following': following_count,
+                'tweets': tweet_count,
+                'verified': verified,
+                'profile_image_url': user.profile_image_url if hasattr(user, 'profile_image_url') else (user.get('profile_image_url') or user.get('profilePicture', '') if is_dict else ''),
+                'relevance_score': relevance_score,
+                'matched_keywords': matched_keywords
+            }
+            entry = (relevance_score, -len(seen_ids), account)
+            seen_ids.add(user_id)
+            if len(top_accounts) < max_results:
+                heapq.heappush(top_accounts, entry)
+            else:
+                heapq.heappushpop(top_accounts, entry)
         
-        return unique_accounts
+        # Highest relevance first, earlier accounts first on ties (accounts are unique already)
+        top_accounts.sort(reverse=True)
+        return [account for _, _, account in top_accounts]
         
     except Exception as e:
         error_msg = str(e)
@@ -183,12 +318,35 @@ def search_accounts_by_keywords(
         return []
 
 
-def _calculate_relevance(user: Any, keyword: str, all_keywords: List[str]) -> float:
-    """Calculate relevance score for an account based on keywords"""
+# Related terms per keyword stem (simple keyword matching)
+# In a real implementation, we'd use NLP/semantic search
+_RELATED_TERMS = {
+    'ai': ['artificial intelligence', 'machine learning', 'ml', 'deep learning'],
+    'startup': ['entrepreneur', 'founder', 'business', 'company'],
+    'saas': ['software', 'product', 'tech', 'platform'],
+    'productivity': ['efficiency', 'workflow', 'tools', 'optimization'],
+    'marketing': ['growth', 'advertising', 'brand', 'campaign'],
+    'design': ['ui', 'ux', 'visual', 'creative', 'aesthetic']
+}
+
+
+@lru_cache(maxsize=256)
+def _related_term_groups(keyword_lower: str) -> tuple:
+    """Related-term lists whose stem occurs in the keyword, resolved once per keyword"""
+    return tuple(related for term, related in _RELATED_TERMS.items() if term in keyword_lower)
+
+
+def _calculate_relevance(description: str, name: str, keyword_lower: str, verified: bool) -> float:
+    """
+    Calculate relevance score for an account based on a keyword
+    
+    Args:
+        description: Account description, already lowercased
+        name: Account display name, already lowercased
+        keyword_lower: Matched keyword, already lowercased
+        verified: Whether the account is verified
+    """
     score = 0.0
-    description = (user.description or '').lower()
-    name = (user.name or '').lower()
-    keyword_lower = keyword.lower()
     
     # Check if keyword appears in description
     if keyword_lower in description:
@@ -198,26 +356,15 @@ def _calculate_relevance(user: Any, keyword: str, all_keywords: List[str]) -> fl
     if keyword_lower in name:
         score += 0.3
     
-    # Check for related terms (simple keyword matching)
-    # In a real implementation, we'd use NLP/semantic search
-    related_terms = {
-        'ai': ['artificial intelligence', 'machine learning', 'ml', 'deep learning'],
-        'startup': ['entrepreneur', 'founder', 'business', 'company'],
-        'saas': ['software', 'product', 'tech', 'platform'],
-        'productivity': ['efficiency', 'workflow', 'tools', 'optimization'],
-        'marketing': ['growth', 'advertising', 'brand', 'campaign'],
-        'design': ['ui', 'ux', 'visual', 'creative', 'aesthetic']
-    }
-    
-    for term, related in related_terms.items():
-        if term in keyword_lower:
-            for rel_term in related:
-                if rel_term in description:
-                    score += 0.1
-                    break
+    # Check for related terms
+    for related in _related_term_groups(keyword_lower):
+        for rel_term in related:
+            if rel_term in description:
+                score += 0.1
+                break
     
     # Boost score for verified accounts
-    if user.verified:
+    if verified:
         score += 0.1
     
     # Normalize to 0-1 range
@@ -255,10 +402,8 @@ def discover_accounts_for_user(
         # Combine with base relevance score
         account['weighted_relevance'] = (account['relevance_score'] * 0.7) + (weighted_score * 0.3)
     
-    # Sort by weighted relevance
-    accounts.sort(key=lambda x: x.get('weighted_relevance', 0), reverse=True)
-    
-    return accounts[:30]  # Return top 30
+    # Top 30 by weighted relevance
+    return heapq.nlargest(30, accounts, key=itemgetter('weighted_relevance'))
 
 
 def get_posts_for_onboarding(
@@ -325,13 +470,18 @@ def get_posts_for_onboarding(
         else:
             print("Fast mode: skipping AI expansion for immediate results")
         
-        # Step 2: Execute multiple search queries and combine results
-        for i, query in enumerate(search_queries):
+        # The subset queries coincide for 1 or 3 keywords (and AI queries can
+        # repeat a fallback); run each distinct query once
+        search_queries = list(dict.fromkeys(search_queries))
+        
+        # Step 2: Execute the search queries concurrently (each is an independent
+        # X API round trip) and combine results in query order
+        def run_query(i: int, query: str) -> List[Any]:
             try:
                 print(f"Executing search query {i+1}/{len(search_queries)}: {query[:80]}...")
-                tweets = client.search_recent_tweets(
-                    query=query,
-                    max_results=30,  # Reduced to speed up (we have multiple queries, 30 per query = plenty)
+                tweets = _search_cached(
+                    query,
+                    30,  # Reduced to speed up (we have multiple queries, 30 per query = plenty)
                     tweet_fields=['author_id', 'public_metrics', 'created_at', 'text', 'conversation_id'],
                     user_fields=['username', 'name']
                 )
@@ -339,9 +489,8 @@ def get_posts_for_onboarding(
                 if tweets and tweets.data:
                     tweet_list = list(tweets.data)
                     print(f"Query {i+1} returned {len(tweet_list)} tweets")
-                    all_tweets.extend(tweet_list)
-                else:
-                    print(f"Query {i+1} returned no tweets (tweets={tweets}, data={tweets.data if tweets else None})")
+                    return tweet_list
+                print(f"Query {i+1} returned no tweets (tweets={tweets}, data={tweets.data if tweets else None})")
             except Exception as api_error:
                 error_msg = str(api_error)
                 if "401" in error_msg or "Unauthorized" in error_msg:
@@ -351,7 +500,12 @@ def get_posts_for_onboarding(
                     print(f"Error executing query {i+1}: {error_msg}")
                     import traceback
                     traceback.print_exc()
-                continue
+            return []
+        
+        if search_queries:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_SEARCHES, len(search_queries))) as executor:
+                for tweet_list in executor.map(run_query, range(len(search_queries)), search_queries):
+                    all_tweets.extend(tweet_list)
         
         # Deduplicate tweets by ID
         seen_tweet_ids = set()
@@ -382,30 +536,18 @@ def get_posts_for_onboarding(
         author_data = {}  # Store full author data for later use
         if author_ids_to_fetch:
             try:
-                # Batch fetch users (limit to 100 per batch to avoid API limits)
-                for i in range(0, len(author_ids_to_fetch), 100):
-                    batch_ids = author_ids_to_fetch[i:i+100]
-                    users_response = client.get_users(ids=batch_ids)
-                    users_data = None
-                    if hasattr(users_response, 'data'):
-                        users_data = users_response.data
-                    elif isinstance(users_response, list):
-                        users_data = users_response
-                    elif hasattr(users_response, 'users'):
-                        users_data = users_response.users
-                    
-                    if users_data:
-                        for user in users_data:
-                            user_id = user.id if hasattr(user, 'id') else (user.get('id') if isinstance(user, dict) else None)
-                            username = user.username if hasattr(user, 'username') else (user.get('username') if isinstance(user, dict) else None)
-                            if user_id and username:
-                                author_usernames[str(user_id)] = username
-                                author_data[str(user_id)] = {
-                                    'username': username,
-                                    'name': user.name if hasattr(user, 'name') else (user.get('name') if isinstance(user, dict) else username),
-                                    'profile_image': user.profile_image_url if hasattr(user, 'profile_image_url') else (user.get('profile_image_url') or user.get('profilePicture', '')),
-                                    'verified': user.verified if hasattr(user, 'verified') else (user.get('verified') or user.get('isBlueVerified', False))
-                                }
+                # Fetch users in bulk (cached per id by _get_users_cached)
+                for user in _get_users_cached(author_ids_to_fetch):
+                    user_id = user.id if hasattr(user, 'id') else (user.get('id') if isinstance(user, dict) else None)
+                    username = user.username if hasattr(user, 'username') else (user.get('username') if isinstance(user, dict) else None)
+                    if user_id and username:
+                        author_usernames[str(user_id)] = username
+                        author_data[str(user_id)] = {
+                            'username': username,
+                            'name': user.name if hasattr(user, 'name') else (user.get('name') if isinstance(user, dict) else username),
+                            'profile_image': user.profile_image_url if hasattr(user, 'profile_image_url') else (user.get('profile_image_url') or user.get('profilePicture', '')),
+                            'verified': user.verified if hasattr(user, 'verified') else (user.get('verified') or user.get('isBlueVerified', False))
+                        }
                 print(f"Fetched usernames for {len(author_usernames)} authors")
             except Exception as e:
                 print(f"Error fetching author usernames: {e}")
@@ -413,6 +555,13 @@ def get_posts_for_onboarding(
                 traceback.print_exc()
         
         # Score and filter posts
+        # (keywords lowercased once with their relevance weight, not per tweet)
+        keyword_weights = [(keyword.lower(), keyword_relevance.get(keyword, 0.5)) for keyword in keywords]
+        keyword_pattern, keyword_within = _keyword_matcher(keyword_lower for keyword_lower, _ in keyword_weights)
+        keyword_totals = {}  # lowercased keyword -> (summed relevance, times it appears in keywords)
+        for keyword_lower, relevance in keyword_weights:
+            total, count = keyword_totals.get(keyword_lower, (0.0, 0))
+            keyword_totals[keyword_lower] = (total + relevance, count + 1)
         filtered_by_engagement = 0
         filtered_by_username = 0
         for tweet in tweet_list:
@@ -448,13 +597,15 @@ def get_posts_for_onboarding(
                 semantic_relevance = 0.0
             
             # Also calculate keyword-based relevance as fallback/boost
+            # (one regex scan per tweet, then only the matched keywords are visited)
             keyword_relevance_score = 0.0
             keyword_matches = 0
-            for keyword in keywords:
-                if keyword.lower() in text.lower():
-                    relevance = keyword_relevance.get(keyword, 0.5)
-                    keyword_relevance_score += relevance
-                    keyword_matches += 1
+            hits = set(keyword_pattern.findall(text.lower())) if keyword_pattern else None
+            if hits:
+                for keyword_lower in set().union(*(keyword_within[hit] for hit in hits)):
+                    total, count = keyword_totals[keyword_lower]
+                    keyword_relevance_score += total
+                    keyword_matches += count
             
             # Normalize keyword relevance
             keyword_relevance_score = min(1.0, keyword_relevance_score / len(keywords)) if keywords else 0.0
@@ -587,9 +738,6 @@ def get_posts_for_onboarding(
                 post['quality_score'] * 0.25
             )
         
-        # Sort by combined score
-        posts.sort(key=lambda x: x['combined_score'], reverse=True)
-        
         # Implement diverse selection strategy based on engagement tiers:
         # 20% Tier 1: 1000+ views, 10+ likes (medium engagement)
         # 40% Tier 2: 3000+ views, 50+ likes (high engagement)
@@ -604,8 +752,8 @@ def get_posts_for_onboarding(
         tier2_posts = [p for p in posts if p.get('engagement_tier') == 'high']
         
         # Sort each tier by combined score (relevance + popularity + quality)
-        tier1_posts.sort(key=lambda x: x['combined_score'], reverse=True)
-        tier2_posts.sort(key=lambda x: x['combined_score'], reverse=True)
+        tier1_posts.sort(key=itemgetter('combined_score'), reverse=True)
+        tier2_posts.sort(key=itemgetter('combined_score'), reverse=True)
         
         # Select diverse mix from tiers
         selected_posts = []
@@ -642,9 +790,8 @@ def get_posts_for_onboarding(
                     selected_posts.append(post)
                     seen_ids.add(post['id'])
         
-        # Sort final selection by combined score
-        selected_posts.sort(key=lambda x: x['combined_score'], reverse=True)
-        posts = selected_posts[:max_results]
+        # Best of the final selection by combined score
+        posts = heapq.nlargest(max_results, selected_posts, key=itemgetter('combined_score'))
         
         print(f"Selected {len(posts)} posts using engagement tier strategy (tier1: {len([p for p in posts if p.get('engagement_tier') == 'medium'])}, tier2: {len([p for p in posts if p.get('engagement_tier') == 'high'])})")
         
@@ -1,15 +1,21 @@
 """Feature 1: List-Based Content Intelligence"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from services.x_api import get_list_timeline, get_list_members
 from services.ai_service import analyze_content_patterns
 from core.persona_state import load_persona_state
 
+# Upper bound on lists analyzed in parallel (each one is X API + LLM round trips)
+MAX_PARALLEL_LISTS = 8
+
 
 def analyze_list_content(
     list_id: str,
     days_back: int = 30,
     max_posts: int = 200,
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None,
+    persona_state: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Analyze content from an X List
@@ -19,12 +25,14 @@ def analyze_list_content(
         days_back: How many days back to analyze
         max_posts: Maximum posts to analyze
         user_id: User ID for user-specific persona state
+        persona_state: Already-loaded persona state (skips reloading it)
     
     Returns:
         Analysis report dictionary
     """
     # Load Persona State for filtering
-    persona_state = load_persona_state(user_id)
+    if persona_state is None:
+        persona_state = load_persona_state(user_id)
     
     # Fetch posts from list
     posts = get_list_timeline(list_id, days_back, max_posts)
@@ -39,20 +47,25 @@ def analyze_list_content(
     members = get_list_members(list_id)
     
     # Analyze with AI (persona-aware)
-    analysis_text = analyze_content_patterns(posts, user_id)
+    analysis_text = analyze_content_patterns(posts, user_id, persona_state)
     
     # Extract basic stats
     total_posts = len(posts)
     total_accounts = len(members)
     
-    # Calculate average post length
-    post_lengths = [len(post["text"].split()) for post in posts]
-    avg_length = sum(post_lengths) / len(post_lengths) if post_lengths else 0
+    # Post length and engagement totals in a single pass over the posts
+    total_words = total_likes = total_replies = total_retweets = 0
+    for post in posts:
+        total_words += len(post["text"].split())
+        metrics = post.get("metrics", {})
+        total_likes += metrics.get("likes", 0)
+        total_replies += metrics.get("replies", 0)
+        total_retweets += metrics.get("retweets", 0)
     
-    # Calculate engagement averages
-    avg_likes = sum(p.get("metrics", {}).get("likes", 0) for p in posts) / total_posts if posts else 0
-    avg_replies = sum(p.get("metrics", {}).get("replies", 0) for p in posts) / total_posts if posts else 0
-    avg_retweets = sum(p.get("metrics", {}).get("retweets", 0) for p in posts) / total_posts if posts else 0
+    avg_length = total_words / total_posts
+    avg_likes = total_likes / total_posts
+    avg_replies = total_replies / total_posts
+    avg_retweets = total_retweets / total_posts
     
     return {
         "list_id": list_id,
@@ -80,11 +93,7 @@ def _extract_top_topics(analysis_text: str, persona_state: Dict[str, Any]) -> Li
     """Extract top topics from analysis that align with persona"""
     # Simple extraction - in production, this would be more sophisticated
     topic_affinity = persona_state.get("topic_affinity", {})
-    top_persona_topics = sorted(
-        topic_affinity.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
+    top_persona_topics = heapq.nlargest(5, topic_affinity.items(), key=lambda x: x[1])
     
     return [topic for topic, _ in top_persona_topics]
 
@@ -102,23 +111,41 @@ def _assess_tone_match(analysis_text: str, persona_state: Dict[str, Any]) -> str
         return "Moderate match"
 
 
-def analyze_multiple_lists(list_ids: List[str], days_back: int = 30) -> Dict[str, Any]:
+def analyze_multiple_lists(
+    list_ids: List[str],
+    days_back: int = 30,
+    user_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Analyze content from multiple lists
     
     Args:
         list_ids: List of X List IDs
         days_back: Days back to analyze
+        user_id: User ID for user-specific persona state
     
     Returns:
         Combined analysis report
     """
     all_analyses = []
     
-    for list_id in list_ids:
-        analysis = analyze_list_content(list_id, days_back)
-        if "error" not in analysis:
-            all_analyses.append(analysis)
+    # Repeated IDs would only repeat the same X API and AI calls
+    list_ids = list(dict.fromkeys(list_ids))
+    if not list_ids:
+        return {"error": "No valid analyses generated"}
+    
+    # Every list is analyzed against the same persona, so load it once
+    persona_state = load_persona_state(user_id)
+    
+    # Each list is independent network-bound work, so fetch/analyze them concurrently
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_LISTS, len(list_ids))) as executor:
+        analyses = executor.map(
+            lambda list_id: analyze_list_content(list_id, days_back, user_id=user_id, persona_state=persona_state),
+            list_ids
+        )
+        for analysis in analyses:
+            if "error" not in analysis:
+                all_analyses.append(analysis)
     
     if not all_analyses:
         return {"error": "No valid analyses generated"}
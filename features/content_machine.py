@@ -1,49 +1,50 @@
 """Feature 2: Content Machine + Smart Scheduler"""
-import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Union, Iterator
+from datetime import datetime, date, timedelta
 from core.persona_state import load_persona_state, update_from_feedback
 from core.learning_loop import process_explicit_feedback
 from services.ai_service import generate_posts, explain_persona_alignment
+from core import storage
 import config
 
 
-def load_content_schedule(user_id: Optional[str] = None) -> Dict[str, Any]:
-    """Load content schedule from JSON"""
+def _get_schedule_file(user_id: Optional[str] = None) -> Path:
+    """Resolve the legacy JSON schedule file for a user (or the global one)"""
     if user_id:
         from core.auth import get_user_data_dir
         user_dir = get_user_data_dir(user_id)
-        schedule_file = user_dir / "content_schedule.json"
-    else:
-        schedule_file = config.CONTENT_SCHEDULE_FILE
-    
-    if schedule_file.exists():
-        try:
-            with open(schedule_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {"posts": []}
-    return {"posts": []}
+        return user_dir / "content_schedule.json"
+    return config.CONTENT_SCHEDULE_FILE
+
+
+def _ensure_imported(user_id: Optional[str] = None) -> None:
+    """Pull an existing content_schedule.json into SQLite on first access"""
+    storage.import_json_schedule(user_id, _get_schedule_file(user_id))
+
+
+def load_content_schedule(user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Load content schedule"""
+    _ensure_imported(user_id)
+    return {"posts": storage.load_posts(user_id)}
 
 
 def save_content_schedule(schedule: Dict[str, Any], user_id: Optional[str] = None) -> None:
-    """Save content schedule to JSON"""
-    if user_id:
-        from core.auth import get_user_data_dir
-        user_dir = get_user_data_dir(user_id)
-        schedule_file = user_dir / "content_schedule.json"
-    else:
-        schedule_file = config.CONTENT_SCHEDULE_FILE
-    
-    with open(schedule_file, 'w', encoding='utf-8') as f:
-        json.dump(schedule, f, indent=2, ensure_ascii=False)
+    """Save (replace) the whole content schedule"""
+    _ensure_imported(user_id)
+    storage.replace_posts(schedule.get("posts", []), user_id)
+
+
+def get_post_by_id(post_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Get a single scheduled post by ID (indexed lookup)"""
+    _ensure_imported(user_id)
+    return storage.get_post(post_id, user_id)
 
 
 def generate_monthly_posts(
     count: int = 30,
     external_signals: Optional[str] = None,
-    start_date: Optional[str] = None,
+    start_date: Optional[Union[str, date]] = None,
     user_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
@@ -61,13 +62,13 @@ def generate_monthly_posts(
     persona_state = load_persona_state(user_id)
     
     # Generate posts using AI
-    posts = generate_posts(count, external_signals, user_id)
+    posts = generate_posts(count, external_signals, user_id, persona_state)
     
     # Add scheduling information
     if not start_date:
         start_date = datetime.now().date()
-    else:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    elif isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
     
     # Get posting preferences
     posts_per_day = persona_state["energy_cadence"]["posts_per_day_tolerance"]
@@ -114,49 +115,52 @@ def generate_monthly_posts(
 
 def add_posts_to_schedule(posts: List[Dict[str, Any]], user_id: Optional[str] = None) -> None:
     """Add generated posts to schedule"""
-    schedule = load_content_schedule(user_id)
-    schedule["posts"].extend(posts)
-    save_content_schedule(schedule, user_id)
+    _ensure_imported(user_id)
+    storage.insert_posts(posts, user_id)
 
 
 def get_scheduled_posts(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
+    start_date: Optional[Union[str, date]] = None,
+    end_date: Optional[Union[str, date]] = None,
     user_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Get scheduled posts within date range
     
     Args:
-        start_date: Start date (YYYY-MM-DD)
-        end_date: End date (YYYY-MM-DD)
+        start_date: Start date (date or YYYY-MM-DD)
+        end_date: End date (date or YYYY-MM-DD)
     
     Returns:
         List of scheduled posts
     """
-    schedule = load_content_schedule(user_id)
-    all_posts = schedule.get("posts", [])
-    
     if not start_date and not end_date:
-        return all_posts
+        return load_content_schedule(user_id)["posts"]
     
-    filtered = []
-    for post in all_posts:
-        post_date = post.get("scheduled_date")
-        if not post_date:
-            continue
-        
-        if start_date and post_date < start_date:
-            continue
-        if end_date and post_date > end_date:
-            continue
-        
-        filtered.append(post)
+    # Stored dates are ISO strings, which compare in date order
+    if isinstance(start_date, date):
+        start_date = start_date.isoformat()
+    if isinstance(end_date, date):
+        end_date = end_date.isoformat()
     
-    # Sort by date and time
-    filtered.sort(key=lambda x: (x.get("scheduled_date", ""), x.get("scheduled_time", "")))
+    # Range filter and date/time ordering run as an indexed query
+    _ensure_imported(user_id)
+    return storage.query_posts_in_range(start_date, end_date, user_id)
+
+
+def iter_scheduled_posts_json(
+    start_date: Optional[Union[str, date]] = None,
+    end_date: Optional[Union[str, date]] = None,
+    user_id: Optional[str] = None
+) -> Iterator[str]:
+    """Same posts as get_scheduled_posts, yielded one stored JSON document at a time"""
+    if isinstance(start_date, date):
+        start_date = start_date.isoformat()
+    if isinstance(end_date, date):
+        end_date = end_date.isoformat()
     
-    return filtered
+    _ensure_imported(user_id)
+    return storage.iter_post_json(start_date, end_date, user_id)
 
 
 def update_post(
@@ -175,40 +179,32 @@ def update_post(
     Returns:
         Updated post dictionary
     """
-    schedule = load_content_schedule(user_id)
-    posts = schedule.get("posts", [])
+    post = get_post_by_id(post_id, user_id)
+    if not post:
+        return {"error": "Post not found"}
     
-    for i, post in enumerate(posts):
-        if post.get("id") == post_id:
-            # Track if content was edited for learning
-            if "content" in updates and updates["content"] != post.get("content"):
-                original_content = post.get("content", "")
-                process_explicit_feedback("edit", updates["content"], original_content, user_id)
-            
-            # Update post
-            posts[i].update(updates)
-            save_content_schedule(schedule, user_id)
-            return posts[i]
+    # Track if content was edited for learning
+    if "content" in updates and updates["content"] != post.get("content"):
+        original_content = post.get("content", "")
+        process_explicit_feedback("edit", updates["content"], original_content, user_id)
     
-    return {"error": "Post not found"}
+    # Update post
+    post.update(updates)
+    storage.update_post_row(post_id, post, user_id)
+    return post
 
 
 def delete_post(post_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
     """Delete a scheduled post"""
-    schedule = load_content_schedule(user_id)
-    posts = schedule.get("posts", [])
+    _ensure_imported(user_id)
+    deleted = storage.delete_post_row(post_id, user_id)
+    if not deleted:
+        return {"error": "Post not found"}
     
-    for i, post in enumerate(posts):
-        if post.get("id") == post_id:
-            deleted = posts.pop(i)
-            save_content_schedule(schedule, user_id)
-            
-            # Learn from rejection
-            process_explicit_feedback("rejection", post.get("content"), None, user_id)
-            
-            return {"deleted": deleted}
+    # Learn from rejection
+    process_explicit_feedback("rejection", deleted.get("content"), None, user_id)
     
-    return {"error": "Post not found"}
+    return {"deleted": deleted}
 
 
 def get_posts_ready_to_post(user_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -221,15 +217,16 @@ def get_posts_ready_to_post(user_id: Optional[str] = None) -> List[Dict[str, Any
     Returns:
         List of posts ready to post
     """
-    schedule = load_content_schedule(user_id)
-    posts = schedule.get("posts", [])
-    
     from datetime import datetime
     now = datetime.now()
     ready_posts = []
     
+    # Index on (owner, status, scheduled_date) narrows this to approved posts due by today
+    _ensure_imported(user_id)
+    posts = storage.query_posts_by_status("approved", now.date().isoformat(), user_id)
+    
     for post in posts:
-        if post.get("status") == "approved" and post.get("scheduled_date") and post.get("scheduled_time"):
+        if post.get("scheduled_date") and post.get("scheduled_time"):
             try:
                 scheduled_datetime_str = f"{post['scheduled_date']} {post['scheduled_time']}"
                 scheduled_datetime = datetime.strptime(scheduled_datetime_str, "%Y-%m-%d %H:%M")
@@ -256,20 +253,17 @@ def approve_post(post_id: str, user_id: Optional[str] = None) -> Dict[str, Any]:
 
 def get_post_rationale(post_id: str, user_id: Optional[str] = None) -> str:
     """Get explanation of why a post fits the persona"""
-    schedule = load_content_schedule(user_id)
-    posts = schedule.get("posts", [])
+    post = get_post_by_id(post_id, user_id)
+    if not post:
+        return "Post not found"
     
-    for post in posts:
-        if post.get("id") == post_id:
-            content = post.get("content", "")
-            rationale = post.get("rationale", "")
-            
-            # Generate enhanced rationale if needed
-            if not rationale or rationale == "Generated based on persona profile":
-                rationale = explain_persona_alignment(content, "post", user_id)
-                update_post(post_id, {"rationale": rationale}, user_id)
-            
-            return rationale
+    content = post.get("content", "")
+    rationale = post.get("rationale", "")
+    
+    # Generate enhanced rationale if needed
+    if not rationale or rationale == "Generated based on persona profile":
+        rationale = explain_persona_alignment(content, "post", user_id)
+        update_post(post_id, {"rationale": rationale}, user_id)
     
-    return "Post not found"
+    return rationale
 
@@ -1,14 +1,20 @@
 """Feature 5: Daily Actions - 'What Should I Do Today?' Dashboard"""
 import json
+import threading
 from datetime import datetime, date, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from core.persona_state import load_persona_state, update_from_feedback
 from core.learning_loop import process_behavioral_feedback, process_temporal_feedback
 from features.content_machine import get_scheduled_posts
 from features.reply_guy import get_pending_replies
 from services.x_api import get_user_timeline, get_user_likes, get_user_replies
+from core import storage
 import config
 
+# Per-user locks around the activity log's load -> modify -> save (user_id -> Lock)
+_activity_log_locks = {}
+_activity_log_locks_lock = threading.Lock()
+
 
 def load_activity_log(user_id: Optional[str] = None) -> Dict[str, Any]:
     """Load activity log from JSON"""
@@ -37,16 +43,31 @@ def save_activity_log(log: Dict[str, Any], user_id: Optional[str] = None) -> Non
     else:
         log_file = config.ACTIVITY_LOG_FILE
     
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(log, f, indent=2, ensure_ascii=False)
+    # Atomic replace, so a concurrent load never reads a half-written log
+    storage.write_file_atomic(log_file, json.dumps(log, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+def _activity_log_lock(user_id: Optional[str]) -> threading.Lock:
+    """Lock serializing updates of one user's activity log"""
+    with _activity_log_locks_lock:
+        return _activity_log_locks.setdefault(user_id, threading.Lock())
 
 
-def get_daily_targets(target_date: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+def _resolve_date(target_date: Optional[Union[str, date]] = None) -> date:
+    """Normalize a date or YYYY-MM-DD string (defaults to today)"""
+    if not target_date:
+        return date.today()
+    if isinstance(target_date, str):
+        return date.fromisoformat(target_date)
+    return target_date
+
+
+def get_daily_targets(target_date: Optional[Union[str, date]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Calculate daily action targets
     
     Args:
-        target_date: Date in YYYY-MM-DD format (defaults to today)
+        target_date: Date or YYYY-MM-DD string (defaults to today)
         user_id: User ID for user-specific data
     
     Returns:
@@ -55,11 +76,11 @@ def get_daily_targets(target_date: Optional[str] = None, user_id: Optional[str]
     persona_state = load_persona_state(user_id)
     activity_log = load_activity_log(user_id)
     
-    if not target_date:
-        target_date = date.today().isoformat()
+    target_day = _resolve_date(target_date)
+    target_date = target_day.isoformat()
     
     # Get yesterday's activity
-    yesterday = (datetime.strptime(target_date, "%Y-%m-%d") - timedelta(days=1)).date().isoformat()
+    yesterday = (target_day - timedelta(days=1)).isoformat()
     yesterday_activity = activity_log.get("daily_activities", {}).get(yesterday, {})
     
     # Base targets from persona
@@ -77,9 +98,10 @@ def get_daily_targets(target_date: Optional[str] = None, user_id: Optional[str]
     
     # Check for fatigue signals
     fatigue_signals = persona_state["energy_cadence"].get("engagement_fatigue_signals", [])
+    fatigue_cutoff = target_day - timedelta(days=3)
     recent_fatigue = [
         s for s in fatigue_signals
-        if datetime.fromisoformat(s["timestamp"]).date() >= (datetime.strptime(target_date, "%Y-%m-%d") - timedelta(days=3)).date()
+        if datetime.fromisoformat(s["timestamp"]).date() >= fatigue_cutoff
     ]
     
     # Adjust targets based on patterns
@@ -95,7 +117,7 @@ def get_daily_targets(target_date: Optional[str] = None, user_id: Optional[str]
         targets["replies"] = max(1, int(targets["replies"] * 0.8))
     
     # Get available content
-    scheduled_posts = get_scheduled_posts(target_date, target_date)
+    scheduled_posts = get_scheduled_posts(target_date, target_date, user_id)
     available_posts = [p for p in scheduled_posts if p.get("status") in ["draft", "approved"]]
     
     # Get available replies
@@ -138,19 +160,18 @@ def _generate_target_rationale(
     return "; ".join(reasons)
 
 
-def get_prioritized_actions(target_date: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+def get_prioritized_actions(target_date: Optional[Union[str, date]] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Get prioritized action list for the day
     
     Args:
-        target_date: Date in YYYY-MM-DD format
+        target_date: Date or YYYY-MM-DD string
         user_id: User ID for user-specific data
     
     Returns:
         List of prioritized actions
     """
-    if not target_date:
-        target_date = date.today().isoformat()
+    target_date = _resolve_date(target_date).isoformat()
     
     actions = []
     
@@ -204,33 +225,35 @@ def track_action(
     if not action_date:
         action_date = date.today().isoformat()
     
-    activity_log = load_activity_log(user_id)
-    
-    if "daily_activities" not in activity_log:
-        activity_log["daily_activities"] = {}
-    
-    if action_date not in activity_log["daily_activities"]:
-        activity_log["daily_activities"][action_date] = {
-            "posts": 0,
-            "replies": 0,
-            "likes": 0,
-            "follows": 0,
-            "actions": []
-        }
-    
-    # Increment counter (handle plural forms)
-    counter_key = f"{action_type}s" if action_type in ["post", "reply", "like", "follow"] else action_type
-    if counter_key in activity_log["daily_activities"][action_date]:
-        activity_log["daily_activities"][action_date][counter_key] += 1
-    
-    # Add action detail
-    activity_log["daily_activities"][action_date]["actions"].append({
-        "type": action_type,
-        "timestamp": datetime.now().isoformat(),
-        "data": action_data
-    })
-    
-    save_activity_log(activity_log, user_id)
+    # Concurrent tracking requests for a user would otherwise drop each other's updates
+    with _activity_log_lock(user_id):
+        activity_log = load_activity_log(user_id)
+        
+        if "daily_activities" not in activity_log:
+            activity_log["daily_activities"] = {}
+        
+        if action_date not in activity_log["daily_activities"]:
+            activity_log["daily_activities"][action_date] = {
+                "posts": 0,
+                "replies": 0,
+                "likes": 0,
+                "follows": 0,
+                "actions": []
+            }
+        
+        # Increment counter (handle plural forms)
+        counter_key = f"{action_type}s" if action_type in ["post", "reply", "like", "follow"] else action_type
+        if counter_key in activity_log["daily_activities"][action_date]:
+            activity_log["daily_activities"][action_date][counter_key] += 1
+        
+        # Add action detail
+        activity_log["daily_activities"][action_date]["actions"].append({
+            "type": action_type,
+            "timestamp": datetime.now().isoformat(),
+            "data": action_data
+        })
+        
+        save_activity_log(activity_log, user_id)
     
     # Process behavioral feedback
     process_behavioral_feedback(action_type, action_data, user_id)
@@ -242,18 +265,17 @@ def track_action(
     }
 
 
-def get_today_progress(target_date: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+def get_today_progress(target_date: Optional[Union[str, date]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Get progress for today's actions
     
     Args:
-        target_date: Date (defaults to today)
+        target_date: Date or YYYY-MM-DD string (defaults to today)
     
     Returns:
         Progress dictionary
     """
-    if not target_date:
-        target_date = date.today().isoformat()
+    target_date = _resolve_date(target_date).isoformat()
     
     targets = get_daily_targets(target_date, user_id)
     activity_log = load_activity_log(user_id)
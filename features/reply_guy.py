@@ -1,13 +1,20 @@
 """Feature 3: Reply Guy Engine"""
 import json
+import threading
+import orjson
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from services.x_api import get_list_timeline, get_list_members
 from services.ai_service import generate_reply_suggestions
 from services.telegram_bot import send_reply_notification
 from core.persona_state import load_persona_state
+from core import storage
 import config
 
+# Guard each file's load -> modify -> save, so concurrent requests can't drop each other's changes
+_tracking_lock = threading.Lock()
+_pending_lock = threading.Lock()
+
 
 def load_reply_tracking() -> Dict[str, Any]:
     """Load reply tracking data"""
@@ -24,8 +31,13 @@ def load_reply_tracking() -> Dict[str, Any]:
 def save_reply_tracking(tracking: Dict[str, Any]) -> None:
     """Save reply tracking data"""
     tracking_file = config.DATA_DIR / "reply_tracking.json"
-    with open(tracking_file, 'w', encoding='utf-8') as f:
-        json.dump(tracking, f, indent=2, ensure_ascii=False)
+    storage.write_file_atomic(tracking_file, json.dumps(tracking, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+def _save_pending_replies(pending: List[Dict[str, Any]]) -> None:
+    """Replace the pending queue (atomically, so readers never see a partial file)"""
+    pending_file = config.DATA_DIR / "pending_replies.json"
+    storage.write_file_atomic(pending_file, json.dumps(pending, indent=2, ensure_ascii=False).encode('utf-8'))
 
 
 def monitor_list_accounts(list_id: str, hours_back: int = 24) -> List[Dict[str, Any]]:
@@ -61,6 +73,7 @@ def monitor_list_accounts(list_id: str, hours_back: int = 24) -> List[Dict[str,
     
     # Generate reply suggestions for each
     reply_opportunities = []
+    newly_tracked = {}
     persona_state = load_persona_state()
     
     for post in recent_posts:
@@ -80,13 +93,17 @@ def monitor_list_accounts(list_id: str, hours_back: int = 24) -> List[Dict[str,
             })
             
             # Mark as tracked
-            tracking["tracked_posts"][post["id"]] = {
+            newly_tracked[post["id"]] = {
                 "tracked_at": datetime.now().isoformat(),
                 "list_id": list_id
             }
     
-    tracking["last_check"] = datetime.now().isoformat()
-    save_reply_tracking(tracking)
+    # Merge into the current file; the API/AI calls above run without the lock
+    with _tracking_lock:
+        tracking = load_reply_tracking()
+        tracking.setdefault("tracked_posts", {}).update(newly_tracked)
+        tracking["last_check"] = datetime.now().isoformat()
+        save_reply_tracking(tracking)
     
     return reply_opportunities
 
@@ -112,28 +129,38 @@ def _filter_by_persona(
     return filtered
 
 
+# Parsed pending_replies.json, keyed by the file's (mtime_ns, size) so polls skip re-parsing
+_pending_cache = {"version": None, "replies": []}
+
+
 def get_pending_replies() -> List[Dict[str, Any]]:
-    """Get all pending reply opportunities"""
+    """Get all pending reply opportunities (re-parsed only when the file changes)"""
     # This would load from a queue or database
     # For now, return empty list (would be populated by monitoring)
     pending_file = config.DATA_DIR / "pending_replies.json"
-    if pending_file.exists():
+    try:
+        stat = pending_file.stat()
+    except OSError:
+        return []
+    
+    version = (stat.st_mtime_ns, stat.st_size)
+    if _pending_cache["version"] != version:
         try:
-            with open(pending_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
+            replies = orjson.loads(pending_file.read_bytes())
+        except (orjson.JSONDecodeError, IOError):
             return []
-    return []
+        _pending_cache["version"] = version
+        _pending_cache["replies"] = replies
+    # New list so callers can append/filter without touching the cache
+    return list(_pending_cache["replies"])
 
 
 def save_pending_reply(opportunity: Dict[str, Any]) -> None:
     """Save a reply opportunity to pending queue"""
-    pending = get_pending_replies()
-    pending.append(opportunity)
-    
-    pending_file = config.DATA_DIR / "pending_replies.json"
-    with open(pending_file, 'w', encoding='utf-8') as f:
-        json.dump(pending, f, indent=2, ensure_ascii=False)
+    with _pending_lock:
+        pending = get_pending_replies()
+        pending.append(opportunity)
+        _save_pending_replies(pending)
 
 
 def process_reply_opportunities(list_ids: List[str]) -> Dict[str, Any]:
@@ -180,17 +207,15 @@ def mark_reply_used(post_id: str, reply_content: str) -> Dict[str, Any]:
     Returns:
         Confirmation
     """
-    pending = get_pending_replies()
-    
-    # Remove from pending
-    updated_pending = [
-        p for p in pending
-        if p.get("post_id") != post_id
-    ]
-    
-    pending_file = config.DATA_DIR / "pending_replies.json"
-    with open(pending_file, 'w', encoding='utf-8') as f:
-        json.dump(updated_pending, f, indent=2, ensure_ascii=False)
+    with _pending_lock:
+        pending = get_pending_replies()
+        
+        # Remove from pending
+        updated_pending = [
+            p for p in pending
+            if p.get("post_id") != post_id
+        ]
+        _save_pending_replies(updated_pending)
     
     # Learn from reply choice
     from core.learning_loop import process_explicit_feedback
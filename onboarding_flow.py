@@ -1,18 +1,22 @@
 """Step-by-step onboarding flow with X account connection"""
 from typing import Dict, Any, Optional, List
 from core.persona_state import load_persona_state, save_persona_state
-from core.auth import update_user, get_user_data_dir, load_users, save_users
+from core.auth import update_user, get_user_data_dir, load_user, save_user
 from services.x_api import get_user_timeline, get_user_likes, get_user_replies, get_current_user
 from services.ai_service import client
-from features.account_discovery import discover_accounts_for_user, get_posts_for_onboarding
+from features.account_discovery import (
+    discover_accounts_for_user, get_posts_for_onboarding, get_account_feed, get_account_details
+)
+from core.learning_loop import process_onboarding_response
 from datetime import datetime
 import json
+import httpx
 
 
-def get_onboarding_step(user_id: str) -> Dict[str, Any]:
-    """Get current onboarding step for user"""
-    users = load_users()
-    user = users.get(user_id)
+def get_onboarding_step(user_id: str, user: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Get current onboarding step for user (pass an already-loaded user record to skip the account file)"""
+    if user is None:
+        user = load_user(user_id)
     
     if not user:
         return {"step": 1, "message": "User not found"}
@@ -61,31 +65,30 @@ def connect_x_account(user_id: str, x_username: str) -> Dict[str, Any]:
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
     # Test connection by trying to fetch user data
     try:
-        import requests
         timeline = get_user_timeline(x_username, days_back=1, max_results=1)
         # If we can fetch, connection works
-        users[user_id]["x_username"] = x_username
-        users[user_id]["x_connected"] = True
-        users[user_id]["onboarding_step"] = 2
-        save_users(users)
+        user["x_username"] = x_username
+        user["x_connected"] = True
+        user["onboarding_step"] = 2
+        save_user(user_id, user)
         
         return {
             "success": True,
             "message": "X account connected successfully",
             "step": 2
         }
-    except requests.exceptions.ReadTimeout:
+    except httpx.TimeoutException:
         return {
             "success": False,
             "error": "Connection timed out. The X API is slow right now. Please try again."
         }
-    except requests.exceptions.RequestException as e:
+    except httpx.RequestError as e:
         return {
             "success": False,
             "error": f"Network error: {str(e)}. Please check your connection and try again."
@@ -114,8 +117,8 @@ def save_keywords(user_id: str, keywords: List[str]) -> Dict[str, Any]:
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
     # Validate keywords
@@ -127,9 +130,9 @@ def save_keywords(user_id: str, keywords: List[str]) -> Dict[str, Any]:
         }
     
     # Save keywords and move to next step
-    users[user_id]["keywords"] = keywords
-    users[user_id]["onboarding_step"] = 3
-    save_users(users)
+    user["keywords"] = keywords
+    user["onboarding_step"] = 3
+    save_user(user_id, user)
     
     return {
         "success": True,
@@ -150,8 +153,8 @@ def save_keyword_relevance(user_id: str, keyword_relevance: Dict[str, float]) ->
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
     # Validate relevance scores
@@ -163,9 +166,9 @@ def save_keyword_relevance(user_id: str, keyword_relevance: Dict[str, float]) ->
             }
     
     # Save relevance preferences and initialize interactive onboarding
-    users[user_id]["keyword_relevance"] = keyword_relevance
-    users[user_id]["onboarding_step"] = 4
-    users[user_id]["interactive_onboarding"] = {
+    user["keyword_relevance"] = keyword_relevance
+    user["onboarding_step"] = 4
+    user["interactive_onboarding"] = {
         "phase": 1,
         "phase1_index": 0,
         "phase2_index": 0,
@@ -177,7 +180,7 @@ def save_keyword_relevance(user_id: str, keyword_relevance: Dict[str, float]) ->
         "phase4_responses": [],
         "data_preparing": True  # Flag to indicate data is being prepared
     }
-    save_users(users)
+    save_user(user_id, user)
     
     # Note: _prepare_onboarding_data will be called as background task in the endpoint
     # Return immediately - data preparation happens asynchronously
@@ -200,11 +203,10 @@ def get_interactive_onboarding_status(user_id: str) -> Dict[str, Any]:
     Returns:
         Dict with phase, progress, and status
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"active": False, "error": "User not found"}
     
-    user = users[user_id]
     interactive = user.get("interactive_onboarding", {})
     
     if not interactive:
@@ -286,11 +288,10 @@ def get_next_onboarding_post(user_id: str, phase: int) -> Dict[str, Any]:
     Returns:
         Post data or error
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
-    user = users[user_id]
     interactive = user.get("interactive_onboarding", {})
     keywords = user.get("keywords", [])
     keyword_relevance = user.get("keyword_relevance", {})
@@ -336,9 +337,6 @@ def get_next_onboarding_post(user_id: str, phase: int) -> Dict[str, Any]:
         print(f"No cached posts found for phase {phase}, attempting quick fetch...")
         try:
             # Use fast mode for immediate results (non-blocking)
-            from features.account_discovery import get_posts_for_onboarding
-            from datetime import datetime
-            
             if phase == 1:
                 posts = get_posts_for_onboarding(keywords, keyword_relevance, 'like', 20, fast_mode=True)
             elif phase == 2:
@@ -481,13 +479,10 @@ def get_next_onboarding_profile(user_id: str) -> Dict[str, Any]:
     Returns:
         Profile data with feed or error
     """
-    from features.account_discovery import get_account_feed, get_account_details
-    
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
-    user = users[user_id]
     interactive = user.get("interactive_onboarding", {})
     keywords = user.get("keywords", [])
     keyword_relevance = user.get("keyword_relevance", {})
@@ -583,11 +578,10 @@ def save_onboarding_response(
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
-    user = users[user_id]
     interactive = user.get("interactive_onboarding", {})
     
     # Save response
@@ -608,8 +602,8 @@ def save_onboarding_response(
     index_key = f"phase{phase}_index"
     interactive[index_key] = interactive.get(index_key, 0) + 1
     
-    users[user_id]["interactive_onboarding"] = interactive
-    save_users(users)
+    user["interactive_onboarding"] = interactive
+    save_user(user_id, user, defer=True)
     
     # Get post/account data for persona update
     if post_id:
@@ -644,7 +638,6 @@ def save_onboarding_response(
                 pass
     
     # Update persona state
-    from core.learning_loop import process_onboarding_response
     process_onboarding_response(phase, response, user_id)
     
     # Check if phase is complete
@@ -653,8 +646,8 @@ def save_onboarding_response(
         # Move to next phase
         if phase < 4:
             interactive["phase"] = phase + 1
-            users[user_id]["interactive_onboarding"] = interactive
-            save_users(users)
+            user["interactive_onboarding"] = interactive
+            save_user(user_id, user, defer=True)
         else:
             # All phases complete
             complete_interactive_onboarding(user_id)
@@ -676,11 +669,10 @@ def skip_onboarding_phase(user_id: str) -> Dict[str, Any]:
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
-    user = users[user_id]
     interactive = user.get("interactive_onboarding", {})
     
     if not interactive:
@@ -696,11 +688,10 @@ def skip_onboarding_phase(user_id: str) -> Dict[str, Any]:
         interactive[f"phase{phase + 1}_responses"] = []
     else:
         # Complete onboarding when skipping last phase
-        from onboarding_flow import complete_interactive_onboarding
         return complete_interactive_onboarding(user_id)
     
     user["interactive_onboarding"] = interactive
-    save_users(users)
+    save_user(user_id, user, defer=True)
     
     return {
         "success": True,
@@ -720,13 +711,13 @@ def complete_interactive_onboarding(user_id: str) -> Dict[str, Any]:
     Returns:
         Result dict
     """
-    users = load_users()
-    if user_id not in users:
+    user = load_user(user_id)
+    if user is None:
         return {"success": False, "error": "User not found"}
     
-    users[user_id]["onboarding_complete"] = True
-    users[user_id]["onboarding_step"] = 5
-    save_users(users)
+    user["onboarding_complete"] = True
+    user["onboarding_step"] = 5
+    save_user(user_id, user)
     
     return {
         "success": True,
@@ -737,8 +728,7 @@ def complete_interactive_onboarding(user_id: str) -> Dict[str, Any]:
 def _prepare_onboarding_data(user_id: str) -> None:
     """Prepare and cache onboarding data (accounts and posts) - runs as background task"""
     try:
-        users = load_users()
-        user = users.get(user_id)
+        user = load_user(user_id)
         if not user:
             print(f"User {user_id} not found for data preparation")
             return
@@ -769,8 +759,6 @@ def _prepare_onboarding_data(user_id: str) -> None:
         
         # Fetch and cache posts for each phase with full AI search (comprehensive, not fast_mode)
         # This runs in background, so we can use full AI without blocking
-        from datetime import datetime
-        
         for phase, post_type, count in [(1, 'like', 20), (2, 'reply', 10), (3, 'engage', 20)]:
             try:
                 print(f"Preparing AI-enhanced posts for phase {phase} (comprehensive search)...")
@@ -805,12 +793,12 @@ def _prepare_onboarding_data(user_id: str) -> None:
                     json.dump(cache_data, f, indent=2, ensure_ascii=False)
         
         # Mark data preparation as complete
-        users = load_users()
-        if user_id in users:
-            interactive = users[user_id].get("interactive_onboarding", {})
+        user = load_user(user_id)
+        if user is not None:
+            interactive = user.get("interactive_onboarding", {})
             interactive["data_preparing"] = False
-            users[user_id]["interactive_onboarding"] = interactive
-            save_users(users)
+            user["interactive_onboarding"] = interactive
+            save_user(user_id, user, defer=True)
             print(f"Data preparation completed for user {user_id}")
     except Exception as e:
         print(f"Error in background data preparation: {e}")
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 """Simple script to run the X Growth AI Tool"""
 import uvicorn
+import config
 
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
-        host="127.0.0.1",
-        port=8000,
+        host=config.HOST,
+        port=config.PORT,
+        loop="uvloop",
+        http="httptools",
         reload=True
     )
 
@@ -1,5 +1,7 @@
 """AI Service - OpenAI integration with persona-aware prompts"""
 import openai
+import orjson
+import re
 from typing import Dict, Any, List, Optional
 import config
 from core.persona_state import load_persona_state
@@ -9,8 +11,14 @@ import time
 if config.OPENAI_API_KEY:
     openai.api_key = config.OPENAI_API_KEY
     client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
+    # For calls made directly from async request handlers
+    async_client = openai.AsyncOpenAI(api_key=config.OPENAI_API_KEY)
 else:
     client = None
+    async_client = None
+
+# Fallback for replies that wrap the JSON object in extra text
+_JSON_BLOCK = re.compile(r'\{.*\}', re.DOTALL)
 
 
 def validate_openai_key() -> Dict[str, Any]:
@@ -82,9 +90,10 @@ def validate_openai_key() -> Dict[str, Any]:
             }
 
 
-def _get_persona_context(user_id: Optional[str] = None) -> str:
+def _get_persona_context(user_id: Optional[str] = None, state: Optional[Dict[str, Any]] = None) -> str:
     """Get Persona State as context string for prompts"""
-    state = load_persona_state(user_id)
+    if state is None:
+        state = load_persona_state(user_id)
     
     context = f"""User's Persona Profile:
 
@@ -117,12 +126,13 @@ RISK SENSITIVITY:
     return context
 
 
-def extract_topics_from_text(text: str) -> Dict[str, float]:
+def extract_topics_from_text(text: str, fallback: bool = True) -> Optional[Dict[str, float]]:
     """
     Extract topics from text using AI
     
     Args:
         text: Text to analyze
+        fallback: On an API error, return keyword-matched topics; if False, return None
     
     Returns:
         Dict mapping topics to weights (0-1)
@@ -147,36 +157,41 @@ def extract_topics_from_text(text: str) -> Dict[str, float]:
         
     except Exception as e:
         print(f"Error extracting topics: {e}")
-        # Fallback: simple keyword matching
-        topics = {}
-        text_lower = text.lower()
-        topic_keywords = {
-            'ai': ['ai', 'artificial intelligence', 'machine learning', 'ml'],
-            'startups': ['startup', 'entrepreneur', 'founder'],
-            'saas': ['saas', 'software', 'platform'],
-            'product': ['product', 'feature', 'development'],
-            'design': ['design', 'ui', 'ux', 'visual'],
-            'marketing': ['marketing', 'growth', 'advertising'],
-            'productivity': ['productivity', 'efficiency', 'workflow'],
-            'business': ['business', 'company', 'revenue'],
-            'tech': ['tech', 'technology', 'coding', 'developer']
-        }
-        
-        for topic, keywords in topic_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    topics[topic] = 0.5
-                    break
-        
-        return topics
+        return topics_from_keywords(text) if fallback else None
+
+
+def topics_from_keywords(text: str) -> Dict[str, float]:
+    """Fallback topic extraction by simple keyword matching"""
+    topics = {}
+    text_lower = text.lower()
+    topic_keywords = {
+        'ai': ['ai', 'artificial intelligence', 'machine learning', 'ml'],
+        'startups': ['startup', 'entrepreneur', 'founder'],
+        'saas': ['saas', 'software', 'platform'],
+        'product': ['product', 'feature', 'development'],
+        'design': ['design', 'ui', 'ux', 'visual'],
+        'marketing': ['marketing', 'growth', 'advertising'],
+        'productivity': ['productivity', 'efficiency', 'workflow'],
+        'business': ['business', 'company', 'revenue'],
+        'tech': ['tech', 'technology', 'coding', 'developer']
+    }
+    
+    for topic, keywords in topic_keywords.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                topics[topic] = 0.5
+                break
+    
+    return topics
 
 
-def analyze_tone(text: str) -> Dict[str, Any]:
+def analyze_tone(text: str, fallback: bool = True) -> Optional[Dict[str, Any]]:
     """
     Analyze tone and style of text
     
     Args:
         text: Text to analyze
+        fallback: On an API error, return heuristic tone estimates; if False, return None
     
     Returns:
         Dict with tone characteristics
@@ -201,30 +216,40 @@ def analyze_tone(text: str) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"Error analyzing tone: {e}")
-        # Fallback: simple heuristics
-        tone = {
-            "sentence_length": "medium",
-            "question_frequency": text.count('?') / max(len(text.split('.')) + len(text.split('!')), 1),
-            "humor_present": False,
-            "emotional_intensity": "moderate",
-            "formality": "casual"
-        }
-        
-        avg_sentence_length = len(text.split()) / max(text.count('.') + text.count('!'), 1)
-        if avg_sentence_length < 10:
-            tone["sentence_length"] = "short"
-        elif avg_sentence_length > 25:
-            tone["sentence_length"] = "long"
-        
-        return tone
+        return estimate_tone(text) if fallback else None
+
+
+def estimate_tone(text: str) -> Dict[str, Any]:
+    """Fallback tone analysis by simple heuristics"""
+    tone = {
+        "sentence_length": "medium",
+        "question_frequency": text.count('?') / max(len(text.split('.')) + len(text.split('!')), 1),
+        "humor_present": False,
+        "emotional_intensity": "moderate",
+        "formality": "casual"
+    }
+    
+    avg_sentence_length = len(text.split()) / max(text.count('.') + text.count('!'), 1)
+    if avg_sentence_length < 10:
+        tone["sentence_length"] = "short"
+    elif avg_sentence_length > 25:
+        tone["sentence_length"] = "long"
+    
+    return tone
 
 
-def analyze_content_patterns(posts: List[Dict[str, Any]], user_id: Optional[str] = None) -> str:
+def analyze_content_patterns(
+    posts: List[Dict[str, Any]],
+    user_id: Optional[str] = None,
+    persona_state: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Analyze posts from X Lists to extract patterns
     
     Args:
         posts: List of post dictionaries with 'text', 'author', etc.
+        user_id: User ID for user-specific persona state
+        persona_state: Already-loaded persona state (skips reloading it)
     
     Returns:
         Markdown-formatted analysis report
@@ -238,7 +263,7 @@ def analyze_content_patterns(posts: List[Dict[str, Any]], user_id: Optional[str]
         for post in posts[:50]  # Limit to 50 posts for token efficiency
     ])
     
-    persona_context = _get_persona_context(user_id)
+    persona_context = _get_persona_context(user_id, persona_state)
     
     prompt = f"""{persona_context}
 
@@ -273,13 +298,22 @@ Focus on insights that would help generate content that matches the user's perso
         return f"Error analyzing content: {str(e)}"
 
 
-def generate_posts(count: int = 30, external_signals: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+def generate_posts(
+    count: int = 30,
+    external_signals: Optional[str] = None,
+    user_id: Optional[str] = None,
+    persona_state: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
     """
     Generate persona-aligned post ideas
     
+    All posts come back from a single completion, so callers should ask for
+    the whole batch at once rather than one post per call.
+    
     Args:
         count: Number of posts to generate
         external_signals: Analysis from Feature 1 (optional)
+        persona_state: Already-loaded Persona State (skips a reload)
     
     Returns:
         List of post dictionaries with content, rationale, tags
@@ -287,7 +321,7 @@ def generate_posts(count: int = 30, external_signals: Optional[str] = None, user
     if not client:
         return [{"error": "OpenAI API key not configured"}]
     
-    persona_context = _get_persona_context(user_id)
+    persona_context = _get_persona_context(user_id, persona_state)
     
     signals_context = ""
     if external_signals:
@@ -329,18 +363,16 @@ Generate diverse post types: insights, opinions, relatable content, questions, c
             response_format={"type": "json_object"}
         )
         
-        import json
         content = response.choices[0].message.content
         
         # Try to parse JSON
         try:
-            result = json.loads(content)
-        except json.JSONDecodeError:
+            result = orjson.loads(content)
+        except orjson.JSONDecodeError:
             # If parsing fails, try to extract JSON from text
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_BLOCK.search(content)
             if json_match:
-                result = json.loads(json_match.group())
+                result = orjson.loads(json_match.group())
             else:
                 return [{"error": "Failed to parse AI response as JSON"}]
         
@@ -431,18 +463,16 @@ Format as JSON array:
             response_format={"type": "json_object"}
         )
         
-        import json
         content = response.choices[0].message.content
         
         # Try to parse JSON
         try:
-            result = json.loads(content)
-        except json.JSONDecodeError:
+            result = orjson.loads(content)
+        except orjson.JSONDecodeError:
             # If parsing fails, try to extract JSON from text
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_BLOCK.search(content)
             if json_match:
-                result = json.loads(json_match.group())
+                result = orjson.loads(json_match.group())
             else:
                 return [{"error": "Failed to parse AI response as JSON"}]
         
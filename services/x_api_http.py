@@ -1,5 +1,5 @@
 """HTTP-based X/Twitter API Client for twitterapi.io and similar services"""
-import requests
+import httpx
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import json
@@ -22,6 +22,13 @@ class HTTPAPIClient:
             "x-api-key": api_key,  # twitterapi.io requires x-api-key header
             "Content-Type": "application/json"
         }
+        # One pooled client for all calls so TLS connections are kept alive and reused
+        self.session = httpx.Client(
+            headers=self.headers,
+            timeout=30.0,
+            follow_redirects=True,  # requests followed redirects; httpx does not by default
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
     
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
         """
@@ -50,11 +57,11 @@ class HTTPAPIClient:
             for attempt in range(max_retries):
                 try:
                     if method == "GET":
-                        response = requests.get(url, headers=self.headers, params=params, timeout=30)
+                        response = self.session.get(url, params=params)
                     else:
-                        response = requests.request(method, url, headers=self.headers, json=params, timeout=30)
+                        response = self.session.request(method, url, json=params)
                     break  # Success, exit retry loop
-                except requests.exceptions.ReadTimeout:
+                except httpx.ReadTimeout:
                     if attempt < max_retries - 1:
                         print(f"Request timeout, retrying ({attempt + 1}/{max_retries})...")
                         continue
@@ -283,7 +290,8 @@ class HTTPAPIClient:
         query: str,
         max_results: int = 100,
         tweet_fields: Optional[List[str]] = None,
-        user_fields: Optional[List[str]] = None
+        user_fields: Optional[List[str]] = None,
+        expansions: Optional[List[str]] = None
     ) -> Any:
         """
         Search for recent tweets
@@ -293,6 +301,7 @@ class HTTPAPIClient:
             max_results: Maximum results
             tweet_fields: Fields to include
             user_fields: User fields to include
+            expansions: With 'author_id', tweet authors are returned in includes['users']
         
         Returns:
             Response object (compatible with tweepy format)
@@ -330,6 +339,8 @@ class HTTPAPIClient:
         
         # Convert to tweepy-compatible format
         tweets = []
+        expand_authors = bool(expansions and 'author_id' in expansions)
+        included_users = {}  # author id -> user, for includes['users']
         for tweet_data in tweets_data:
             # Handle twitterapi.io response format
             tweet_id = tweet_data.get('id', '')
@@ -345,6 +356,9 @@ class HTTPAPIClient:
             author = tweet_data.get('author', {})
             author_id = author.get('id', '') if isinstance(author, dict) else None
             author_username = author.get('userName', '') if isinstance(author, dict) else None
+            if expand_authors and author_id and str(author_id) not in included_users:
+                # Search results carry the author's profile, so no separate user lookup is needed
+                included_users[str(author_id)] = self._convert_user(author)
             
             # Parse created_at
             created_at = None
@@ -386,9 +400,28 @@ class HTTPAPIClient:
         
         return type('Response', (), {
             'data': tweets,
+            'includes': {'users': list(included_users.values())} if expand_authors else {},
             'meta': meta
         })()
     
+    @staticmethod
+    def _convert_user(user_data: Dict) -> Any:
+        """Tweepy-compatible user object from a twitterapi.io user (camelCase field names)"""
+        return type('User', (), {
+            'id': str(user_data.get('id', '')),
+            'username': user_data.get('userName', ''),  # camelCase
+            'name': user_data.get('name', ''),
+            'description': user_data.get('description', ''),
+            'public_metrics': type('Metrics', (), {
+                'followers_count': user_data.get('followers', 0),  # API uses 'followers' not 'followersCount'
+                'following_count': user_data.get('following', 0),  # API uses 'following' not 'followingCount'
+                'tweet_count': user_data.get('statusesCount', 0),  # API uses 'statusesCount'
+                'like_count': user_data.get('favouritesCount', 0)  # API uses 'favouritesCount'
+            })(),
+            'verified': user_data.get('isBlueVerified', False),  # API uses 'isBlueVerified'
+            'profile_image_url': user_data.get('profilePicture', '')  # API uses 'profilePicture'
+        })()
+    
     def get_users(self, ids: List[str], user_fields: Optional[List[str]] = None) -> Any:
         """
         Get multiple users by IDs
@@ -427,24 +460,7 @@ class HTTPAPIClient:
             return type('Response', (), {'data': None})()
         
         # Convert to tweepy-compatible format
-        users = []
-        for user_data in users_data:
-            # twitterapi.io uses camelCase field names
-            user = type('User', (), {
-                'id': str(user_data.get('id', '')),
-                'username': user_data.get('userName', ''),  # camelCase
-                'name': user_data.get('name', ''),
-                'description': user_data.get('description', ''),
-                'public_metrics': type('Metrics', (), {
-                    'followers_count': user_data.get('followers', 0),  # API uses 'followers' not 'followersCount'
-                    'following_count': user_data.get('following', 0),  # API uses 'following' not 'followingCount'
-                    'tweet_count': user_data.get('statusesCount', 0),  # API uses 'statusesCount'
-                    'like_count': user_data.get('favouritesCount', 0)  # API uses 'favouritesCount'
-                })(),
-                'verified': user_data.get('isBlueVerified', False),  # API uses 'isBlueVerified'
-                'profile_image_url': user_data.get('profilePicture', '')  # API uses 'profilePicture'
-            })()
-            users.append(user)
+        users = [self._convert_user(user_data) for user_data in users_data]
         
         return type('Response', (), {'data': users})()
     